@@ -1,2 +1,4 @@
-from coffee.cli import CLI
-CLI().start()
+import sys
+
+from coffee.cli import main
+sys.exit (main())
@@ -0,0 +1,303 @@
+""" analytics on top of an FSM: shortest paths between states (breadth
+    first), strongly connected components (Tarjan, linear time), loops
+    and reachability between any two states (transitive closure over
+    the components, one bitset per component).
+
+    results are computed from the FSM's adjacency arrays when first
+    asked for and cached until the FSM changes (see FSM.version)
+"""
+
+import weakref
+
+from array import array
+from collections import deque
+
+
+class Analysis ():
+    """ results for one version of an FSM, computed lazily. ids are
+        positions in the FSM's `states`
+    """
+
+    def __init__ (self, fsm):
+        self._version = fsm.version
+        self._states = fsm.states
+        self._offsets, self._targets = fsm.adjacency()
+
+        self._components = None     # lists of ids, reverse topological order
+        self._component_of = None   # id -> component
+        self._closure = None        # component -> bitset of reachable ids
+        self._bfs = {}              # source id -> (parents, distances)
+
+    def __repr__ (self):
+        return 'Analysis (version={version}, states={states})'.format (
+            version = self.version,
+            states  = len (self._states),
+        )
+
+    @property
+    def version (self):
+        return self._version
+
+    def components (self):
+        """ return the strongly connected components as lists of ids,
+            components reachable from another one come before it
+        """
+
+        if self._components is None:
+            self._component_of, self._components = _tarjan (len (self._states), self._offsets, self._targets)
+
+        return self._components
+
+    def component_of (self, i):
+        self.components ()
+
+        return self._component_of[i]
+
+    def closure (self):
+        """ return a bitset (int) per component, bit i set if state i
+            is reachable from the component's states (including their
+            own). components come sinks first, every component's set
+            is the union of its successors' and its own
+        """
+
+        if self._closure is not None:
+            return self._closure
+
+        components = self.components ()
+        component_of = self._component_of
+        offsets, targets = self._offsets, self._targets
+
+        closure = []
+        for c, members in enumerate (components):
+            bits = 0
+            for v in members:
+                bits |= 1 << v
+            for v in members:
+                for pos in range (offsets[v], offsets[v + 1]):
+                    d = component_of[targets[pos]]
+                    if d != c:
+                        bits |= closure[d]
+            closure.append (bits)
+
+        self._closure = closure
+
+        return closure
+
+    def bfs (self, source):
+        """ return (parents, distances) of a breadth first search from
+            the given state id: parents[i] is the state before i on a
+            shortest path, distances[i] its number of transitions. both
+            are -1 if i can not be reached (parents also for the source)
+        """
+
+        result = self._bfs.get (source)
+        if result is not None:
+            return result
+
+        offsets, targets = self._offsets, self._targets
+        parents = array ('l', [-1]) * len (self._states)
+        distances = array ('l', [-1]) * len (self._states)
+        distances[source] = 0
+
+        queue = deque ([source])
+        while queue:
+            v = queue.popleft()
+            for pos in range (offsets[v], offsets[v + 1]):
+                w = targets[pos]
+                if distances[w] == -1:
+                    distances[w] = distances[v] + 1
+                    parents[w] = v
+                    queue.append (w)
+
+        self._bfs[source] = parents, distances
+
+        return parents, distances
+
+
+# analyses by FSM, replaced once the FSM changes
+_analyses = weakref.WeakKeyDictionary()
+
+
+def analysis (fsm):
+    # OUT: Analysis of the FSM's current version
+    result = _analyses.get (fsm)
+    if result is None or result.version != fsm.version:
+        result = _analyses[fsm] = Analysis (fsm)
+
+    return result
+
+
+def shortest_path (fsm, frm, to):
+    """ return the states on a shortest path from state `frm` to state
+        `to` (both included, by name), None if there is none. paths
+        prefer states first by name (next states are sorted)
+    """
+
+    source, target = fsm.state_id (frm), fsm.state_id (to)
+    states = fsm.states
+
+    if source == target:
+        return [states[source]]
+
+    parents, distances = analysis (fsm).bfs (source)
+    if parents[target] == -1:
+        return None
+
+    path = [target]
+    while path[-1] != source:
+        path.append (parents[path[-1]])
+
+    return [states[i] for i in reversed (path)]
+
+
+def distances (fsm, frm):
+    # OUT: dict state-name -> number of transitions on a shortest path
+    #      from state `frm`, for all states reachable from it
+    parents, found = analysis (fsm).bfs (fsm.state_id (frm))
+
+    return {state.name: d for state, d in zip (fsm.states, found) if d != -1}
+
+
+def reaches (fsm, frm, to):
+    # OUT: True if state `to` can be reached from state `frm` (every
+    #      state reaches itself), O(1) once the closure is built
+    a = analysis (fsm)
+    source, target = fsm.state_id (frm), fsm.state_id (to)
+
+    return bool (a.closure()[a.component_of (source)] >> target & 1)
+
+
+def components (fsm):
+    # OUT: strongly connected components (lists of states), components
+    #      reachable from another one come before it
+    states = fsm.states
+
+    return [[states[i] for i in members] for members in analysis (fsm).components()]
+
+
+def loops (fsm):
+    # OUT: components holding a cycle (several states, or a state with a
+    #      transition to itself), eg. 'doing' <-> 'on hold'
+    offsets, targets = fsm.adjacency()
+
+    return [
+        sorted (members, key = lambda s: s.name)
+        for members in components (fsm)
+        if len (members) > 1 or _self_loop (fsm.state_id (members[0].name), offsets, targets)
+    ]
+
+
+def _self_loop (i, offsets, targets):
+    return i in targets[offsets[i]:offsets[i + 1]]
+
+
+def workflow_order (n, offsets, targets, start, names):
+    """ return the ids of the states reachable from `start` in
+        topological order of their strongly connected components: a
+        component comes after all components leading to it, ready
+        components go by the name of their first state. inside a
+        component states go depth-first and alphabetically from the
+        state it is entered by (the order of Tarjan's search).
+
+        linear in states and transitions, plus a heap of the
+        components ready to go
+    """
+
+    import heapq
+
+    component_of, components = _tarjan (n, offsets, targets, roots = [start])
+
+    # Tarjan pops members off its stack, reverse them into the order
+    # they were found in, entry state first
+    for members in components:
+        members.reverse()
+
+    # in-degrees of the condensation (a transition counts once per pair
+    # of components, not per transition)
+    indegree = array ('l', [0]) * len (components)
+    marked = array ('l', [-1]) * len (components)    # component d last counted for
+    following = [[] for c in components]
+    for c, members in enumerate (components):
+        marked[c] = c
+        for v in members:
+            for pos in range (offsets[v], offsets[v + 1]):
+                d = component_of[targets[pos]]
+                if marked[d] != c:
+                    marked[d] = c
+                    following[c].append (d)
+                    indegree[d] += 1
+
+    ready = [(names[components[c][0]], c) for c in range (len (components)) if not indegree[c]]
+    heapq.heapify (ready)
+
+    order = []
+    while ready:
+        name, c = heapq.heappop (ready)
+        order.extend (components[c])
+        for d in following[c]:
+            indegree[d] -= 1
+            if not indegree[d]:
+                heapq.heappush (ready, (names[components[d][0]], d))
+
+    return order
+
+
+def _tarjan (n, offsets, targets, roots = None):
+    """ Tarjan's strongly connected components, iteratively (no
+        recursion limit for long chains). returns (component per id,
+        components as lists of ids), in reverse topological order.
+        with roots given, only states reachable from them are searched
+        (others are in component -1)
+    """
+
+    index = array ('l', [-1]) * n
+    low = array ('l', [0]) * n
+    component_of = array ('l', [-1]) * n
+    on_stack = bytearray (n)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in (range (n) if roots is None else roots):
+        if index[root] != -1:
+            continue
+
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append (root)
+        on_stack[root] = 1
+        work = [[root, offsets[root]]]
+
+        while work:
+            frame = work[-1]
+            v, pos = frame
+
+            if pos < offsets[v + 1]:
+                frame[1] = pos + 1
+                w = targets[pos]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append (w)
+                    on_stack[w] = 1
+                    work.append ([w, offsets[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work and low[v] < low[work[-1][0]]:
+                low[work[-1][0]] = low[v]
+
+            if low[v] == index[v]:
+                members = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = 0
+                    component_of[w] = len (components)
+                    members.append (w)
+                    if w == v:
+                        break
+                components.append (members)
+
+    return component_of, components
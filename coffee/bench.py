@@ -0,0 +1,521 @@
+""" simple scaling benchmarks, run with
+
+        python -m coffee.bench [--max-issues N] [--json FILE] [--compare FILE]
+
+    FSM benchmarks are run for doubling input sizes and several shapes
+    of FSMs (see SHAPES), issue benchmarks for powers of ten up to
+    --max-issues. the time per element should stay (roughly) constant
+    for linear code. start-up time is measured with `python -X
+    importtime` against a budget.
+
+    results can be stored as JSON and compared to an earlier run, to
+    spot regressions across commits
+"""
+
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+
+from coffee.coffee import FSM, Issues
+from coffee.moves import Moves
+from coffee import query
+
+
+def chain_transitions (n):
+    # IN:  number of transitions
+    # OUT: transitions of a plain chain S0 -> S1 -> ... -> Sn
+    return [
+        { 'from' : 'S{}'.format (i), 'to' : 'S{}'.format (i + 1) }
+        for i in range (n)
+    ]
+
+
+def fanout_transitions (n):
+    # IN:  number of transitions
+    # OUT: transitions of a wide fan-out S -> Fi -> E, n // 2 states wide
+    width = max (n // 2, 1)
+    return [
+        { 'from' : frm, 'to' : to }
+        for i in range (width)
+        for frm, to in (('S', 'F{}'.format (i)), ('F{}'.format (i), 'E'))
+    ]
+
+
+def dag_transitions (n, degree = 8):
+    # IN:  number of transitions, out-degree of (most) states
+    # OUT: transitions of a dense DAG, every state Si leads to the
+    #      next `degree` states, S0 is the start state, the last state
+    #      the end state
+    states = max (n // degree, 1) + 1
+    return [
+        { 'from' : 'S{}'.format (i), 'to' : 'S{}'.format (j) }
+        for i in range (states)
+        for j in range (i + 1, min (i + 1 + degree, states))
+    ]
+
+
+def cyclic_transitions (n):
+    # IN:  number of transitions
+    # OUT: transitions of a chain with a loop back every other state,
+    #      like 'doing' <-> 'on hold'
+    states = max (2 * n // 3, 1)
+    return chain_transitions (states) + [
+        { 'from' : 'S{}'.format (i + 1), 'to' : 'S{}'.format (i) }
+        for i in range (1, states - 1, 2)
+    ]
+
+
+# FSM shapes benchmarked, name -> generator of transitions
+SHAPES = {
+    'chain'   : chain_transitions,
+    'fan-out' : fanout_transitions,
+    'dag'     : dag_transitions,
+    'cyclic'  : cyclic_transitions,
+}
+
+
+def chain_issues (n, states):
+    # IN:  number of issues, number of states of the chain
+    # OUT: issues spread evenly over the states of a chain
+    return [
+        { 'title' : 'Issue {}'.format (i), 'state' : 'S{}'.format (i % (states + 1)) }
+        for i in range (n)
+    ]
+
+
+def issue_sizes (largest):
+    # OUT: powers of ten from 1000 up to largest
+    return [10 ** e for e in range (3, len (str (int (largest))))]
+
+
+def timed (func, *args, **kwa):
+    # OUT: seconds spent running func
+    start = time.perf_counter()
+    func (*args, **kwa)
+    return time.perf_counter() - start
+
+
+def allocated (func, *args, **kwa):
+    # OUT: bytes still allocated by func's result (input not included)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func (*args, **kwa)  # keep result alive until measured
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_build (sizes, shape = chain_transitions):
+    # OUT: list of (size, seconds) for building an FSM of the given shape
+    results = []
+
+    for n in sizes:
+        transitions = shape (n)
+        results.append ((n, timed (FSM, transitions = transitions)))
+
+    return results
+
+
+def bench_workflow (sizes, shape = chain_transitions, order = None):
+    # OUT: list of (size, seconds) for the workflow of an FSM of the given
+    #      shape, in the given order (see FSM.ORDERS)
+    results = []
+
+    for n in sizes:
+        fsm = FSM (transitions = shape (n), order = order)
+        results.append ((n, timed (fsm.workflow)))
+
+    return results
+
+
+def bench_validate (sizes, shape = chain_transitions, scratch = True):
+    # OUT: list of (size, seconds) for validating an FSM of the given shape
+    #      from scratch, or (not scratch) once degrees and adjacency are
+    #      up to date, ie. the validation itself
+    results = []
+
+    for n in sizes:
+        fsm = FSM (transitions = shape (n))
+        if scratch:
+            fsm.invalidate ()
+        else:
+            fsm.adjacency ()
+        results.append ((n, timed (fsm.validate)))
+
+    return results
+
+
+def bench_patch (sizes):
+    # OUT: list of (size, seconds) for extending a chain FSM by one state
+    results = []
+
+    for n in sizes:
+        fsm = FSM (transitions = chain_transitions (n))
+        fsm.workflow ()
+        results.append ((n, timed (
+            fsm.patch,
+            add = [{ 'from' : 'S{}'.format (n), 'to' : 'S{}'.format (n + 1) }],
+        )))
+
+    return results
+
+
+def bench_grouping (sizes):
+    # OUT: list of (size, seconds) for grouping issues by state
+    results = []
+
+    for n in sizes:
+        issues = chain_issues (n, 100)
+        results.append ((n, timed (Issues, issues = issues)))
+
+    return results
+
+
+def bench_moves (sizes):
+    # OUT: list of (size, seconds) for ingesting a JSONL feed moving
+    #      every issue one state ahead
+    results = []
+
+    for n in sizes:
+        issues = chain_issues (n, 99)   # no issues in the end state S100
+        feed = io.StringIO (''.join (
+            json.dumps ({
+                'title' : issue['title'],
+                'from'  : issue['state'],
+                'to'    : 'S{}'.format (int (issue['state'][1:]) + 1),
+            }) + '\n'
+            for issue in issues
+        ))
+        moves = Moves (fsm = FSM (transitions = chain_transitions (100)), issues = Issues (issues = issues))
+        results.append ((n, timed (moves.ingest, feed)))
+
+    return results
+
+
+def bench_load (sizes, suffix = '.yml', cached = False):
+    """ return list of (size, seconds) for reading a file of issues in
+        100 states (plus their transitions for YAML files), parsed or
+        taken from its snapshot
+    """
+
+    from coffee.cli import read
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            filename = os.path.join (directory, 'issues{}{}'.format (n, suffix))
+            with open (filename, 'w') as f:
+                if suffix == '.jsonl':
+                    f.writelines (json.dumps (issue) + '\n' for issue in chain_issues (n, 100))
+                else:
+                    f.write ('transitions:\n')
+                    f.writelines ('  - {{ from: {from}, to: {to} }}\n'.format (**t) for t in chain_transitions (100))
+                    f.write ('issues:\n')
+                    f.writelines ('  - {{ title: {title}, state: {state} }}\n'.format (**i) for i in chain_issues (n, 100))
+
+            with _cache (directory if cached else ''):
+                if cached:
+                    read (filename)
+                results.append ((n, timed (read, filename)))
+
+    return results
+
+
+@contextlib.contextmanager
+def _cache (directory):
+    # snapshots go to the given directory, an empty one disables them
+    saved = os.environ.get ('COFFEE_CACHE')
+    os.environ['COFFEE_CACHE'] = directory
+    try:
+        yield
+    finally:
+        if saved is None:
+            del os.environ['COFFEE_CACHE']
+        else:
+            os.environ['COFFEE_CACHE'] = saved
+
+
+def bench_print (sizes):
+    # OUT: list of (size, seconds) for `print`ing issues in 100 states
+    from coffee.cli import CLI
+
+    results = []
+
+    for n in sizes:
+        cli = CLI()
+        cli.fsm = FSM (transitions = chain_transitions (100))
+        cli.issues = Issues (issues = chain_issues (n, 100))
+        cli.fsm.workflow ()
+
+        with open (os.devnull, 'w') as devnull, contextlib.redirect_stdout (devnull):
+            results.append ((n, timed (cli.printer)))
+
+    return results
+
+
+def bench_export (sizes, fmt = 'csv'):
+    # OUT: list of (size, seconds) for exporting issues in 100 states to a file
+    from coffee.report import write
+
+    results = []
+
+    for n in sizes:
+        fsm = FSM (transitions = chain_transitions (100))
+        issues = Issues (issues = chain_issues (n, 100))
+        fsm.workflow ()
+
+        with tempfile.TemporaryDirectory (prefix = 'coffee-bench-') as directory:
+            with open (os.path.join (directory, 'export'), 'w', newline = '') as f:
+                results.append ((n, timed (write, fsm, issues, f, fmt)))
+
+    return results
+
+
+def bench_title_index (sizes):
+    # OUT: list of (size, seconds) for building the title index
+    results = []
+
+    for n in sizes:
+        issues = Issues (issues = chain_issues (n, 100))
+        results.append ((n, timed (query.TitleIndex, issues)))
+
+    return results
+
+
+def bench_query (sizes):
+    # OUT: list of (size, seconds) for a query by title in all states,
+    #      answered from the (already built) title index
+    results = []
+
+    for n in sizes:
+        issues = Issues (issues = chain_issues (n, 100))
+        query.title_index (issues)
+        results.append ((n, timed (lambda: query.compile ('title "^Issue 4711$"').run (issues))))
+
+    return results
+
+
+def bench_issue_memory (sizes):
+    # OUT: list of (size, bytes) held by grouped issues
+    results = []
+
+    for n in sizes:
+        issues = chain_issues (n, 100)
+        results.append ((n, allocated (Issues, issues = issues)))
+
+    return results
+
+
+# start-up budget for `import coffee.cli` (seconds), and modules which
+# must not be imported before a command needs them
+IMPORT_BUDGET = 0.05
+LAZY_MODULES = ('yaml', 'prompt_toolkit', 'graphviz', 'coffee.graph', 'argparse', 'subprocess')
+
+# fresh interpreters must find this very package
+TOPDIR = os.path.dirname (os.path.dirname (os.path.abspath (__file__)))
+
+
+def import_time (module, runs = 5):
+    # OUT: best cumulative import time of module in a fresh
+    #      interpreter (seconds), taken from `python -X importtime`
+    best = None
+
+    for _ in range (runs):
+        stderr = subprocess.run (
+            [sys.executable, '-X', 'importtime', '-c', 'import {}'.format (module)],
+            stderr = subprocess.PIPE,
+            check  = True,
+            cwd    = TOPDIR,
+        ).stderr.decode()
+
+        for line in stderr.splitlines():
+            fields = [f.strip() for f in line.split ('|')]
+            if len (fields) == 3 and fields[2] == module:
+                cumulative = int (fields[1]) / 1e6
+                best = cumulative if best is None else min (best, cumulative)
+
+    return best
+
+
+def imported_modules (code):
+    # OUT: names of all modules loaded after running code in a fresh interpreter
+    return set (subprocess.run (
+        [sys.executable, '-c', '{}\nimport sys\nprint ("\\n".join (sys.modules))'.format (code)],
+        stdout = subprocess.PIPE,
+        check  = True,
+        cwd    = TOPDIR,
+    ).stdout.decode().split())
+
+
+def report_import (module):
+    seconds = import_time (module)
+    loaded = imported_modules ('import {}'.format (module))
+
+    print ('import {}:'.format (module))
+    print ('  {seconds:10.4f}s (budget {budget:.4f}s) {verdict}'.format (
+        seconds = seconds,
+        budget  = IMPORT_BUDGET,
+        verdict = 'OK' if seconds <= IMPORT_BUDGET else 'OVER BUDGET',
+    ))
+    for name in LAZY_MODULES:
+        if name in loaded:
+            print ('  imported eagerly: {}'.format (name))
+    print ()
+
+
+def report (name, results):
+    # OUT: results, as printed
+    print ('{}:'.format (name))
+    for n, seconds in results:
+        print ('  {n:>10} {seconds:10.4f}s {per:10.2f}us/element'.format (
+            n       = n,
+            seconds = seconds,
+            per     = seconds / n * 1e6,
+        ))
+    print ()
+
+    return results
+
+
+def report_memory (name, results):
+    # OUT: results, as printed
+    print ('{}:'.format (name))
+    for n, size in results:
+        print ('  {n:>10} {size:10}B {per:10.2f}B/element'.format (
+            n    = n,
+            size = size,
+            per  = size / n,
+        ))
+    print ()
+
+    return results
+
+
+def run (sizes, issues, validated = 100000):
+    """ run all benchmarks, FSM ones for the given sizes (number of
+        transitions), issue ones for the given numbers of issues,
+        validation (alone) of FSMs of every shape for the given number
+        of transitions too. returns dict of benchmark name -> list of
+        (size, value)
+    """
+
+    results = {}
+
+    for shape, transitions in SHAPES.items():
+        results['FSM build ({})'.format (shape)] = report ('FSM build ({})'.format (shape), bench_build (sizes, transitions))
+        results['FSM workflow ({})'.format (shape)] = report ('FSM workflow ({})'.format (shape), bench_workflow (sizes, transitions))
+        name = 'FSM workflow ({}, topological)'.format (shape)
+        results[name] = report (name, bench_workflow (sizes, transitions, 'topological'))
+        name = 'FSM validate ({}, adjacency built)'.format (shape)
+        results[name] = report (name, bench_validate ([validated], transitions, scratch = False))
+
+    for name, bench in (
+        ('FSM validate (chain)', bench_validate),
+        ('FSM patch (chain, +1 transition)', bench_patch),
+    ):
+        results[name] = report (name, bench (sizes))
+
+    for name, bench in (
+        ('Issues grouping (100 states)', bench_grouping),
+        ('Issue moves (JSONL feed, 100 states)', bench_moves),
+        ('Load (YAML, parsed)', bench_load),
+        ('Load (YAML, snapshot)', lambda sizes: bench_load (sizes, cached = True)),
+        ('Load (JSONL, parsed)', lambda sizes: bench_load (sizes, suffix = '.jsonl')),
+        ('Print (100 states)', bench_print),
+        ('Export (CSV, 100 states)', bench_export),
+        ('Export (JSONL, 100 states)', lambda sizes: bench_export (sizes, 'jsonl')),
+        ('Title index', bench_title_index),
+        ('Query (title, indexed)', bench_query),
+    ):
+        results[name] = report (name, bench (issues))
+
+    results['Issues memory (100 states)'] = report_memory ('Issues memory (100 states)', bench_issue_memory (issues))
+
+    return results
+
+
+def revision ():
+    # OUT: git revision of the benchmarked code, None if unknown
+    try:
+        return subprocess.run (
+            ['git', 'describe', '--always', '--dirty'],
+            stdout = subprocess.PIPE,
+            stderr = subprocess.DEVNULL,
+            check  = True,
+            cwd    = TOPDIR,
+        ).stdout.decode().strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare (results, baseline, threshold = 1.25):
+    # print time (or size) per element of results relative to the
+    # baseline's, at the largest size both have. OUT: True if none is
+    # worse than threshold
+    print ('compared to {}:'.format (baseline.get ('revision') or 'baseline'))
+
+    ok = True
+    for name, measured in results.items():
+        before = dict (baseline.get ('results', {}).get (name) or [])
+        common = [(n, value) for n, value in measured if n in before and before[n]]
+        if not common:
+            continue
+
+        n, value = common[-1]
+        ratio = value / before[n]
+        ok = ok and ratio <= threshold
+        print ('  {name:<40} {n:>10} {ratio:8.2f}x {verdict}'.format (
+            name    = name,
+            n       = n,
+            ratio   = ratio,
+            verdict = 'SLOWER' if ratio > threshold else '',
+        ))
+    print ()
+
+    return ok
+
+
+def main (argv = None):
+    import argparse
+
+    parser = argparse.ArgumentParser (prog = 'python -m coffee.bench', description = 'Run scaling benchmarks.')
+    parser.add_argument ('--max-issues', type = float, default = 1e5, metavar = 'N',
+        help = 'largest set of issues, eg. 1e7 (default: 1e5)')
+    parser.add_argument ('--json', metavar = 'FILE', help = 'store results as JSON')
+    parser.add_argument ('--compare', metavar = 'FILE', help = 'compare to results stored earlier')
+    args = parser.parse_args (argv)
+
+    sizes = [2 ** e * 1000 for e in range (7)]
+
+    report_import ('coffee.cli')
+    results = run (sizes, issue_sizes (args.max_issues))
+
+    ok = True
+    if args.compare:
+        with open (args.compare) as f:
+            ok = compare (results, json.load (f))
+
+    if args.json:
+        with open (args.json, 'w') as f:
+            json.dump ({
+                'revision' : revision(),
+                'python'   : platform.python_version(),
+                'machine'  : platform.machine(),
+                'date'     : time.strftime ('%Y-%m-%dT%H:%M:%S%z'),
+                'results'  : results,
+            }, f, indent = 1)
+
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit (main())
@@ -1,34 +1,59 @@
-from prompt_toolkit import prompt
-from prompt_toolkit.contrib.completers import WordCompleter
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.styles import style_from_dict
-from prompt_toolkit.token import Token
-import subprocess
-import yaml
+import time
+import sys
 import os
 import re
 
-from coffee.coffee import Issue, Transition, FSM
-from coffee.graph import graph
+from itertools import chain
+
+from coffee.coffee import Issue, Issues, Transition, FSM
+from coffee.ingest import iter_jsonl, iter_yaml, safe_loader
+from coffee.moves import Moves
+from coffee import snapshot
+from coffee import stats
+
+# note: heavy modules are imported by the commands needing them, to keep
+# start-up fast: prompt_toolkit (interactive mode only), coffee.graph
+# (drawing), yaml (by coffee.ingest), argparse, subprocess
+
+# top-level keys of transitions: a complete FSM, or changes to one
+TRANSITIONS = ('transitions', 'add_transitions', 'remove_transitions')
+
+# note: parameters are taken as they are (queries hold quotes and regexes)
+COMMAND = re.compile (r'^(?P<command>[\w!]+)( +(?P<param>\S.*?))?\s*$')
 
 
 class CLI ():
 
-    def __init__ (self):
+    def __init__ (self, **kwa):
+        # IN:  order (workflow order of FSMs loaded, see FSM.ORDERS)
         self.fsm = None
-        self.issues = []
+        self.issues = Issues()
         self.loaded_from = []
-        self.history = FileHistory (os.path.expanduser ('~/.coffee.history'))
+        self.moves = None
+        self.history = None
+        self.interactive = False
         self.lives = 5
+        self.order = kwa.get ('order') or 'depth'
 
         self.commands = [
-            dict (command = 'load',            description = 'load the given yaml file', handler = self.load,      usage = 'load <filename>'),
+            dict (command = 'load',            description = 'load a yaml/jsonl file',   handler = self.load,      usage = 'load <file(s)>'),
+            dict (command = 'move',            description = 'move issues (jsonl)',      handler = self.move,      usage = 'move <file(s)>'),
             dict (command = '!',               description = 'run <command> in a shell', handler = self.shell,     usage = '! <command>'),
             dict (command = 'print',           description = 'print loaded data',        handler = self.printer),
+            dict (command = 'print',           description = 'print counts and n issues per state', handler = self.printer, usage = 'print summary [<n>]'),
+            dict (command = 'print',           description = 'print n issues per state (page)',     handler = self.printer, usage = 'print <n> [<page>]'),
             dict (command = 'print fsm',       description = 'print the FSM only',       handler = self.printer),
             dict (command = 'print fsm-svg',   description = 'draw the FSM (SVG)',       handler = self.printer),
             dict (command = 'print fsm-ascii', description = 'draw the FSM (ASCII)',     handler = self.printer),
+            dict (command = 'print fsm-dot',   description = 'print the FSM (DOT)',      handler = self.printer),
+            dict (command = 'export',          description = 'export issues (text|csv|jsonl|markdown)', handler = self.export, usage = 'export <format> [<file>]'),
+            dict (command = 'query',           description = 'query issues (see README)', handler = self.query,    usage = 'query <clauses>'),
+            dict (command = 'path',            description = 'shortest path between states', handler = self.path,   usage = 'path <from> <to>'),
+            dict (command = 'loops',           description = 'list loops of states',     handler = self.loops),
+            dict (command = 'order',           description = 'workflow order (depth|topological)', handler = self.ordering, usage = 'order [<order>]'),
+            dict (command = 'unreachable',     description = 'list unreachable states',  handler = self.unreachable),
+            dict (command = 'stats',           description = 'timings/counts (on|off|memory|reset)', handler = self.statistics, usage = 'stats [<switch>]'),
+            dict (command = 'profile',         description = 'profile a command (pstats)', handler = self.profile, usage = 'profile <command>'),
             dict (command = 'clear',           description = 'clear data',               handler = self.clear),
             dict (command = 'quit',            description = 'quit',                     handler = self.quit),
             dict (command = 'help',            description = 'you\'re reading it, HTH',  handler = self.usage),
@@ -36,9 +61,15 @@ class CLI ():
         ]
 
     def next_command (self):
+        from prompt_toolkit import prompt
+        from prompt_toolkit.contrib.completers import WordCompleter
+        from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+        from prompt_toolkit.styles import style_from_dict
+        from prompt_toolkit.token import Token
+
         cmd = prompt (
             '>> ',
-            completer = WordCompleter ('load print clear quit help fsm fsm-ascii fsm fsm-svg'.split()),
+            completer = WordCompleter ('load move print summary export text csv jsonl markdown query state reachable title count path loops order depth topological unreachable stats profile clear quit help fsm fsm-ascii fsm-dot fsm-svg'.split()),
             history = self.history,
             auto_suggest = AutoSuggestFromHistory(),
             get_bottom_toolbar_tokens = self.get_bottom_toolbar_tokens,
@@ -48,47 +79,71 @@ class CLI ():
         return cmd
 
     def start (self):
-        self.usage ()
+        from prompt_toolkit.history import FileHistory
 
-        # note: must put '-' as last to prevent its meaning for ranges
-        prog = re.compile ('^(?P<command>[\w!]+)( (?P<param>[\w./-]+)){0,1}')
+        self.history = FileHistory (os.path.expanduser ('~/.coffee.history'))
+        self.interactive = True
+        self.usage ()
 
         while self.lives:
-            cmd = self.next_command()
+            self.run (self.next_command())
 
-            if not cmd:
-                print ('ERROR: empty command, try again\n')
-                self.lives -= 1
-                continue
+        print ('\n\n\tG A M E   O V E R\n\n')
 
-            result = (prog.match (cmd))
+    def batch (self, commands):
+        """ run the given commands one after another, without any
+            prompt (and without game over). returns True if all
+            commands succeeded
+        """
 
-            #  print ('cmd: {}'.format(cmd))
-            #  print ('command: {}'.format(result.group('command')))
-            #  print ('param: {}'.format(result.group('param')))
+        ok = True
+        for cmd in commands:
+            ok = self.run (cmd) and ok
 
-            command = [c for c in self.commands if c.get ('command') == result.group ('command')]
+        return ok
 
-            if not len (command):
-                print ('ERROR: invalid command, try again\n')
-                self.lives -= 1
-                continue
+    def run (self, cmd):
+        # IN:  a single command line
+        # OUT: True if the command succeeded, failing commands cost a life
+        lives = self.lives
 
-            try:
+        if not cmd:
+            print ('ERROR: empty command, try again\n')
+            self.lives -= 1
+            return False
+
+        result = COMMAND.match (cmd)
+
+        #  print ('cmd: {}'.format(cmd))
+        #  print ('command: {}'.format(result.group('command')))
+        #  print ('param: {}'.format(result.group('param')))
+
+        command = [c for c in self.commands if result and c.get ('command') == result.group ('command')]
+
+        if not len (command):
+            print ('ERROR: invalid command, try again\n')
+            self.lives -= 1
+            return False
+
+        try:
+            with stats.phase (result.group ('command')):
                 if result.group('param'):
                     command.pop().get('handler')(result.group('param'))
                 else:
                     command.pop().get('handler')()
 
-            except Exception as e:
-                print ('ERROR: invalid command, try again: {}\n'.format (e))
-                self.lives -= 1
+        except Exception as e:
+            print ('ERROR: invalid command, try again: {}\n'.format (e))
+            self.lives -= 1
+            if self.interactive:
                 self.usage()
 
-        print ('\n\n\tG A M E   O V E R\n\n')
+        return self.lives >= lives
 
 
     def get_bottom_toolbar_tokens (self, cli):
+        from prompt_toolkit.token import Token
+
         last = ''
         if self.history and len (self.history.strings) > 0:
             last = self.history.strings[-1]
@@ -113,23 +168,26 @@ class CLI ():
             self.lives -= 1
             return
 
-        if arg == 'fsm-ascii':
-            try:
-                graph (
-                    fsm          = self.fsm,
-                    source_files = sorted (self.loaded_from),
-                    fmt          = 'ascii',
-                )
-            except Exception as e:
-                print ('ERROR: {}'.format (e))
+        if arg in ('fsm-ascii', 'fsm-dot'):
+            from coffee.graph import graph
+
+            graph (
+                fsm          = self.fsm,
+                source_files = sorted (self.loaded_from),
+                fmt          = arg[len ('fsm-'):],
+                out          = sys.stdout,
+            )
 
         elif arg == 'fsm-svg':
             try:
-                graph (
+                from coffee.graph import graph
+
+                print ('INFO: wrote {}'.format (graph (
                     fsm          = self.fsm,
                     source_files = sorted (self.loaded_from),
                     fmt          = 'svg',
-                )
+                    view         = self.interactive,
+                )))
             except Exception as e:
                 print ('ERROR: {}'.format (e))
 
@@ -156,21 +214,187 @@ class CLI ():
                 self.lives -= 1
                 return
 
-            print ()
-            for state in self.fsm.workflow():
-                print ('  (*) {name} {is_start}{is_end}'.format (
-                    name = state.name,
-                    is_start = ' (S)' if state.is_start else '',
-                    is_end = ' (E)' if state.is_end else '',
+            # 'print summary [<n>]' and 'print <n> [<page>]' limit the
+            # issues printed per state
+            words = (arg or '').split()
+            summary = words[:1] == ['summary']
+            if summary:
+                words = words[1:] or ['3']
+
+            limit = int (words[0]) if words[:1] and words[0].isdigit() else None
+            page = max (int (words[1]) if limit and words[1:2] and words[1].isdigit() else 1, 1)
+
+            from coffee import report
+
+            report.write (self.fsm, self.issues, sys.stdout, summary = summary, limit = limit, page = page)
+
+    def export (self, args):
+        # IN:  format (see coffee.report) and optionally a file to write
+        #      to instead of stdout
+        import shlex
+
+        from coffee import report
+
+        words = shlex.split (args)
+        if len (words) not in (1, 2):
+            raise RuntimeWarning ('usage: export <format> [<file>]')
+
+        fmt = words[0]
+        if fmt not in report.FORMATS:
+            raise RuntimeWarning ('invalid format: <{}>, one of {}'.format (fmt, ', '.join (report.FORMATS)))
+
+        if not self.fsm or not self.issues:
+            print ('ERROR: Please load FSM and issues\n')
+            self.lives -= 1
+            return
+
+        if len (words) == 1:
+            report.write (self.fsm, self.issues, sys.stdout, fmt)
+            return
+
+        started = time.perf_counter()
+        with open (words[1], 'w', encoding = 'utf-8', newline = '') as f:
+            report.write (self.fsm, self.issues, f, fmt)
+
+        print ('INFO: exported {issues} issues ({fmt}) to {filename} in {seconds:.3f}s'.format (
+            issues   = sum (self.issues.count (s.name) for s in self.fsm.workflow()),
+            fmt      = fmt,
+            filename = words[1],
+            seconds  = time.perf_counter() - started,
+        ))
+
+    def query (self, text):
+        # IN:  query clauses, see coffee.query
+        from coffee import query
+
+        if not self.issues:
+            print ('ERROR: Please load issues\n')
+            self.lives -= 1
+            return
+
+        q = query.compile (text, self.fsm)
+        result = q.run (self.issues)
+
+        # states in workflow order, others (unreachable, unknown) last
+        workflow = [s.name for s in self.fsm.workflow()] if self.fsm else []
+        names = [name for name in workflow if name in result]
+        names += sorted (set (result) - set (names), key = str)
+
+        print ()
+        if q.count:
+            width = max ([len (str (name)) for name in names] or [0])
+            for name in names:
+                print ('  (*) {name:<{width}} {count:>9}'.format (
+                    name  = str (name),
+                    width = width,
+                    count = result[name],
                 ))
-                # simply find issues currently in this state
-                for issue in (i for i in self.issues if i.state == state.name):
+            total = sum (result.values())
+        else:
+            for name in names:
+                print ('  (*) {}'.format (name))
+                for issue in result[name]:
                     print ('    (-) {}'.format (issue.title))
+            total = sum (len (issues) for issues in result.values())
 
-            print ()
-            print ('(S) ... state is a start state')
-            print ('(E) ... state is an end state')
-            print ()
+        print ()
+        print ('  {total} issues in {states} states'.format (total = total, states = len (names)))
+        print ()
+
+    def path (self, names):
+        # IN:  names of two states, quoted if containing spaces
+        import shlex
+        from coffee import analytics
+
+        if not self.fsm:
+            print ('ERROR: Please load FSM\n')
+            self.lives -= 1
+            return
+
+        names = shlex.split (names)
+        if len (names) != 2:
+            raise RuntimeWarning ('need two states: <from> <to>')
+
+        path = analytics.shortest_path (self.fsm, *names)
+
+        print ()
+        if path:
+            print ('  {path} ({count} transitions)'.format (
+                path  = ' -> '.join (s.name for s in path),
+                count = len (path) - 1,
+            ))
+        else:
+            print ('  <{}> can not be reached from <{}>'.format (names[1], names[0]))
+        print ()
+
+    def loops (self):
+        # list groups of states issues may cycle through
+        from coffee import analytics
+
+        if not self.fsm:
+            print ('ERROR: Please load FSM\n')
+            self.lives -= 1
+            return
+
+        loops = analytics.loops (self.fsm)
+
+        print ()
+        if not loops:
+            print ('  no loops')
+
+        for states in loops:
+            print ('  (@) {}'.format (', '.join (s.name for s in states)))
+            for issue in chain.from_iterable (self.issues.in_state (s.name) for s in states):
+                print ('    (-) {}'.format (issue.title))
+
+        print ()
+        print ('(@) ... states reachable from each other')
+        print ()
+
+    def ordering (self, order = None):
+        # IN:  'depth' or 'topological' (see FSM.workflow), used by all
+        #      printers from now on. prints the current order without
+        if order:
+            if order not in FSM.ORDERS:
+                raise RuntimeWarning ('invalid order: <{}>'.format (order))
+
+            self.order = order
+            if self.fsm:
+                self.fsm.order = order
+
+        print ()
+        print ('  workflow order: {}'.format (self.order))
+        print ()
+
+    def unreachable (self):
+        # list states the start state can't reach and issues in states
+        # unknown to the FSM, `print` silently skips both
+        if not self.fsm:
+            print ('ERROR: Please load FSM\n')
+            self.lives -= 1
+            return
+
+        states = self.fsm.unreachable()
+        orphaned = sorted (self.issues.orphaned_states (self.fsm))
+
+        print ()
+        if not states and not orphaned:
+            print ('  all states are reachable')
+
+        for state in states:
+            print ('  (!) {}'.format (state.name))
+            for issue in self.issues.in_state (state.name):
+                print ('    (-) {}'.format (issue.title))
+
+        for name in orphaned:
+            print ('  (?) {}'.format (name))
+            for issue in self.issues.in_state (name):
+                print ('    (-) {}'.format (issue.title))
+
+        print ()
+        print ('(!) ... state is not reachable from the start state')
+        print ('(?) ... state is unknown to the FSM')
+        print ()
 
     def crosscheck_fsm_issues (self):
         ok = True
@@ -178,15 +402,18 @@ class CLI ():
         if (        self.issues
             and     self.fsm
             # sanity check: are there (any) issues matching the loaded FSM ?
-            and not len ([i for state in self.fsm.workflow() for i in self.issues if i.state == state.name])
+            and not any (self.issues.count (state.name) for state in self.fsm.workflow())
         ):
             ok = False
 
         return ok
 
 
-    def load (self, filename):
-        if not filename or not os.path.isfile (filename):
+    def load (self, patterns):
+        # IN:  one or more space separated filenames or glob patterns
+        filenames = expand (patterns)
+
+        if not filenames:
             print ('ERROR: Please enter a valid filename\n')
             self.lives -= 1
             return
@@ -194,47 +421,79 @@ class CLI ():
         try:
             loaded_ok = False
 
-            with open (filename, 'r') as ymlfile:
-                fsm, issues = None, None
-                inputs = yaml.load (ymlfile)
+            # * files are read in parallel, unchanged files are taken
+            #   from their snapshot, if any
+            # * load transitions and issues independently from each other
+            # * transitions of several files must be the same, issues
+            #   of all files are merged
+            # * info if only transitions are loaded (`print` won't print
+            #   anything without an FSM)
+            # * sanity-check: warn if loaded issues and FSM match - if any
+            #   issues are in a known state
+
+            started = time.perf_counter()
+
+            with stats.phase ('read'):
+                results = read_all (filenames)
+
+            for filename, (edges, file_issues, parser, seconds) in zip (filenames, results):
+                print ('INFO: parsed {filename} in {seconds:.3f}s ({parser}): {transitions} transitions, {issues} issues'.format (
+                    filename    = filename,
+                    seconds     = seconds,
+                    parser      = parser,
+                    transitions = sum (len (e) for e in edges.values()),
+                    issues      = len (file_issues),
+                ))
+
+                stats.count ('files read')
+                stats.count ('issues read', len (file_issues))
+                stats.count ('transitions read', sum (len (e) for e in edges.values()))
+
+            if len (filenames) > 1:
+                print ('INFO: read {files} files in {seconds:.3f}s'.format (
+                    files   = len (filenames),
+                    seconds = time.perf_counter() - started,
+                ))
 
-                # * load transitions and issues independently from each other
-                # * info if only transitions are loaded (`print` won't print
-                #   anything without an FSM)
-                # * sanity-check: warn if loaded issues and FSM match - if any
-                #   issues are in a known state
+            transitions, add, remove, issues = combine (filenames, results)
 
-                if type (inputs) != dict:
-                    raise RuntimeWarning ('can\'t load data')
+            if transitions:
+                print ('INFO: loading transitions into FSM')
 
-                if inputs.get ('transitions'):
-                    print ('INFO: loading transitions into FSM')
+                self.fsm = FSM (transitions = transitions, order = self.order)
+                loaded_ok = True
 
-                    self.fsm = FSM (transitions = inputs.get ('transitions'))
-                    loaded_ok = True
+            if add or remove:
+                if not self.fsm:
+                    raise RuntimeWarning ('no FSM loaded to apply changes to')
 
-                if inputs.get ('issues'):
-                    print ('INFO: loading issues')
+                print ('INFO: changing FSM: {add} transitions added, {remove} removed'.format (
+                    add    = len (add),
+                    remove = len (remove),
+                ))
 
-                    self.issues = [
-                        Issue (
-                            title = issue.get ('title'),
-                            state = issue.get ('state'),
-                        )
-                        for issue in inputs.get ('issues')
-                    ]
-                    loaded_ok = True
+                self.fsm.patch (add = add, remove = remove)
+                loaded_ok = True
 
-                    if not self.fsm:
-                        print ('INFO: no FSM loaded yet (won\'t print anything without)')
+            if issues:
+                print ('INFO: loading issues')
 
-                if not self.crosscheck_fsm_issues():
-                    print ('WARNING: loaded issues do not lign up with loaded FSM')
+                self.issues = issues
+                loaded_ok = True
 
-                if loaded_ok:
-                    self.loaded_from.append (filename)
-                else:
-                    raise RuntimeWarning ('can\'t load data')
+                if not self.fsm:
+                    print ('INFO: no FSM loaded yet (won\'t print anything without)')
+
+            if not self.crosscheck_fsm_issues():
+                print ('WARNING: loaded issues do not lign up with loaded FSM')
+
+            if self.fsm and self.fsm.unreachable():
+                print ('WARNING: FSM has unreachable states (see `unreachable`)')
+
+            if loaded_ok:
+                self.loaded_from.extend (filenames)
+            else:
+                raise RuntimeWarning ('can\'t load data')
 
         except Exception as w:
             print ('ERROR: invalid data: <{}>\n'.format (w))
@@ -242,6 +501,86 @@ class CLI ():
             raise w
 
 
+    def move (self, patterns):
+        # IN:  one or more space separated filenames or glob patterns of
+        #      JSON Lines files of moves, applied to the loaded issues
+        filenames = expand (patterns)
+
+        if not filenames:
+            print ('ERROR: Please enter a valid filename\n')
+            self.lives -= 1
+            return
+
+        if not self.fsm or not self.issues:
+            print ('ERROR: Please load FSM and issues\n')
+            self.lives -= 1
+            return
+
+        # moves are logged per loaded FSM and issues
+        if not self.moves or self.moves.fsm is not self.fsm or self.moves.issues is not self.issues:
+            self.moves = Moves (fsm = self.fsm, issues = self.issues)
+
+        for filename in filenames:
+            started = time.perf_counter()
+
+            with open (filename, 'r') as infile:
+                count = self.moves.ingest (infile)
+
+            stats.count ('moves applied', count)
+
+            print ('INFO: applied {count} moves from {filename} in {seconds:.3f}s'.format (
+                count    = count,
+                filename = filename,
+                seconds  = time.perf_counter() - started,
+            ))
+
+
+    def statistics (self, switch = None):
+        # IN:  'on', 'off', 'memory' (on, tracing memory too) or 'reset',
+        #      prints what was recorded so far without
+        if switch in ('on', 'memory'):
+            stats.enable (memory = switch == 'memory')
+        elif switch == 'off':
+            stats.disable ()
+        elif switch == 'reset':
+            stats.reset ()
+        elif switch:
+            raise RuntimeWarning ('invalid switch: <{}>'.format (switch))
+
+        print ()
+        if not stats.enabled():
+            print ('  (instrumentation is off, use `stats on` or set COFFEE_STATS)')
+            print ()
+
+        print ('\n'.join (stats.report()))
+        print ()
+        print ('  states: {states}, issues: {issues}, moves: {moves}'.format (
+            states = len (self.fsm.states) if self.fsm else 0,
+            issues = len (self.issues),
+            moves  = len (self.moves) if self.moves else 0,
+        ))
+        print ()
+
+
+    def profile (self, cmd):
+        # IN:  a command line, run under cProfile. the statistics are
+        #      dumped to a temporary pstats file, the top entries printed
+        import cProfile
+        import pstats
+        import tempfile
+
+        # a failing command costs its life in run(), as usual
+        profiler = cProfile.Profile()
+        profiler.runcall (self.run, cmd)
+
+        fd, path = tempfile.mkstemp (prefix = 'coffee-', suffix = '.pstats')
+        os.close (fd)
+        profiler.dump_stats (path)
+
+        print ('INFO: profile of <{}> written to {}'.format (cmd, path))
+        pstats.Stats (path, stream = sys.stdout).sort_stats ('cumulative').print_stats (15)
+
+
     def usage (self):
         # find the longest line for padding of right column
         max_len = (
@@ -265,11 +604,14 @@ class CLI ():
 
     def clear (self):
         self.fsm = None
-        self.issues = None
+        self.issues = Issues()
         self.loaded_from = []
+        self.moves = None
 
 
     def shell (self, cmd):
+        import subprocess
+
         print (subprocess.run (
             cmd.split(),
             stdout = subprocess.PIPE,
@@ -284,5 +626,168 @@ class CLI ():
         self.lives += 1
 
 
+def expand (patterns):
+    # IN:  space separated filenames or glob patterns
+    # OUT: list of matching files (each once, in given order), None if
+    #      any pattern doesn't match an existing file
+    import glob
+
+    filenames = []
+    for pattern in (patterns or '').split():
+        matches = sorted (f for f in glob.glob (pattern) if os.path.isfile (f))
+        if not matches:
+            return None
+
+        filenames.extend (f for f in matches if f not in filenames)
+
+    return filenames
+
+
+def read (filename):
+    """ read the given file, from its snapshot if there is one.
+        records are streamed and issues go into their state's bucket
+        right away, the whole document is never built. returns
+        (transitions, issues, parser name, seconds), transitions
+        being a dict of top-level key (see TRANSITIONS) -> records
+    """
+
+    started = time.perf_counter()
+
+    cached = snapshot.load (filename)
+    if cached:
+        return cached + ('snapshot', time.perf_counter() - started)
+
+    transitions, issues = {}, Issues()
+
+    with open (filename, 'r') as infile:
+        if filename.endswith ('.jsonl'):
+            records = (('issues', record) for record in iter_jsonl (infile))
+            parser = 'json'
+        else:
+            records = iter_yaml (infile)
+            parser = safe_loader()[1]
+
+        for key, record in records:
+            if key in TRANSITIONS:
+                transitions.setdefault (key, []).append (record)
+            elif key == 'issues':
+                issues.add (Issue (
+                    title = record.get ('title'),
+                    state = record.get ('state'),
+                ))
+
+    snapshot.save (filename, transitions, issues)
+
+    return transitions, issues, parser, time.perf_counter() - started
+
+
+def read_all (filenames):
+    # OUT: list of read() results, several files are read in parallel
+    #      by a pool of processes
+    if len (filenames) < 2:
+        return [read (f) for f in filenames]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor (max_workers = min (len (filenames), os.cpu_count() or 1)) as pool:
+        return list (pool.map (read, filenames))
+
+
+def combine (filenames, results):
+    """ merge the read() results of the given files into (transitions,
+        transitions to add, transitions to remove, issues). transitions
+        given in several files must be the same
+    """
+
+    transitions, add, remove, issues = None, [], [], Issues()
+
+    for filename, (edges, file_issues, parser, seconds) in zip (filenames, results):
+        file_transitions = edges.get ('transitions')
+        add.extend (edges.get ('add_transitions') or [])
+        remove.extend (edges.get ('remove_transitions') or [])
+
+        if file_transitions:
+            if transitions and _edges (transitions) != _edges (file_transitions):
+                raise RuntimeWarning ('conflicting transitions in <{}> and <{}>'.format (transitions_from, filename))
+
+            transitions, transitions_from = file_transitions, filename
+
+        issues.merge (file_issues)
+
+    return transitions, add, remove, issues
+
+
+def _edges (transitions):
+    # OUT: set of (from, to), for comparing transitions of several files
+    return {(t.get ('from'), t.get ('to')) for t in transitions}
+
+
+def main (argv = None):
+    """ entry point: interactive without arguments on a terminal,
+        batch mode otherwise, printing to stdout and returning the
+        exit status
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser (
+        prog        = 'coffee',
+        description = 'Group and sort issues by the states of a workflow.',
+        epilog      = 'without arguments, commands are read from stdin when it is no terminal',
+    )
+    parser.add_argument ('files', nargs = '*', metavar = 'FILE', help = 'yaml/jsonl file to load')
+    parser.add_argument ('-c', '--command', action = 'append', dest = 'commands', default = [], metavar = 'COMMAND',
+        help = 'command to run after loading FILEs (repeatable, default: print)')
+    parser.add_argument ('-', dest = 'stdin', action = 'store_true',
+        help = 'read commands from stdin, one per line')
+    parser.add_argument ('--stats', action = 'store_true',
+        help = 'record timings per phase, printed to stderr at exit')
+    parser.add_argument ('--stats-memory', action = 'store_true',
+        help = 'like --stats, tracing memory allocations too (slow)')
+    parser.add_argument ('--order', choices = FSM.ORDERS, default = 'depth',
+        help = 'workflow order: depth-first (default) or topological, keeping loops together')
+    parser.add_argument ('--serve', metavar = '[HOST:]PORT',
+        help = 'serve FILEs as JSON over HTTP (see coffee.server), reloading them on changes')
+    parser.add_argument ('--reload-interval', type = float, default = 2.0, metavar = 'SECONDS',
+        help = 'seconds between checks for changed FILEs when serving (default: 2)')
+    args = parser.parse_args (argv)
+
+    if args.serve:
+        if not args.files:
+            parser.error ('--serve needs FILEs to serve')
+
+        from coffee.server import serve
+
+        serve (' '.join (args.files), args.serve, args.reload_interval, args.order)
+        return 0
+
+    if args.stats or args.stats_memory:
+        stats.enable (memory = args.stats_memory)
+
+    if not (args.files or args.commands or args.stdin) and sys.stdin.isatty():
+        CLI (order = args.order).start()
+        return 0
+
+    commands = (['load {}'.format (' '.join (args.files))] if args.files else []) + args.commands
+    if args.stdin or not (args.files or args.commands):
+        commands += [
+            line.strip() for line in sys.stdin
+            if line.strip() and not line.strip().startswith ('#')
+        ]
+    elif not args.commands:
+        commands.append ('print')
+
+    try:
+        ok = CLI (order = args.order).batch (commands)
+        if args.stats or args.stats_memory:
+            sys.stderr.write ('\n'.join (stats.report()) + '\n')
+
+        return 0 if ok else 1
+    except BrokenPipeError:
+        # eg. piped into `head`, silence the interpreter's final flush
+        os.dup2 (os.open (os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
 if __name__ == '__main__':
-    CLI().start()
+    sys.exit (main())
@@ -1,5 +1,16 @@
+from array import array
+from itertools import accumulate, chain, compress, repeat
+from operator import not_, sub
+
+from coffee import analytics
+from coffee import stats
+
+
 class Issue ():
 
+    # there may be millions of issues, no per-instance __dict__
+    __slots__ = ('_title', '_state')
+
     def __init__ (self, **kwa):
         self._title = kwa.get ('title')
         self._state = kwa.get ('state')
@@ -27,8 +38,168 @@ class Issue ():
         self._state = state
 
 
+class Issues ():
+    """ issues grouped by state: every issue is put into the bucket
+        of its state once, when added. counts and issues per state
+        are then available without scanning all issues.
+
+        issues moved to another state leave a hole (None) in their
+        old bucket, holes are compacted away once they make up half
+        of a bucket, or when the bucket is read
+    """
+
+    def __init__ (self, **kwa):
+        self._buckets = {}  # state-name -> [Issue]
+        self._count = 0
+        self._holes = {}    # state-name -> number of holes in the bucket
+        self._titles = {}   # state-name -> {title: [positions]}, built by move()
+        self._version = 0   # bumped when issues are added (not moved)
+
+        for issue in kwa.get ('issues') or []:
+            self.add (Issue (
+                title = issue.get ('title'),
+                state = issue.get ('state'),
+            ))
+
+    def __repr__ (self):
+        return 'Issues (count={count}, states={states})'.format (
+            count  = len (self),
+            states = sorted (self.states()),
+        )
+
+    def __len__ (self):
+        return self._count
+
+    def __iter__ (self):
+        for name in list (self._buckets):
+            yield from self.in_state (name)
+
+    @property
+    def version (self):
+        return self._version
+
+    def add (self, issue):
+        self._put (issue)
+        self._version += 1
+
+    def _put (self, issue):
+        bucket = self._buckets.setdefault (issue.state, [])
+
+        titles = self._titles.get (issue.state)
+        if titles is not None:
+            titles.setdefault (issue.title, []).append (len (bucket))
+
+        bucket.append (issue)
+        self._count += 1
+
+    def move (self, title, frm, to):
+        """ move the issue with the given title from state `frm` to
+            state `to`, O(1) amortised. the issue is appended to its
+            new state's issues. raises LookupError if there is no such
+            issue in `frm`
+        """
+
+        positions = self._positions (frm).get (title)
+        if not positions:
+            raise LookupError ('no issue <{}> in state <{}>'.format (title, frm))
+
+        bucket = self._buckets[frm]
+        position = positions.pop (0)    # the first of issues sharing a title
+        if not positions:
+            del self._titles[frm][title]
+
+        issue = bucket[position]
+        bucket[position] = None
+        self._holes[frm] = self._holes.get (frm, 0) + 1
+        self._count -= 1
+
+        if 2 * self._holes[frm] > len (bucket):
+            self._compact (frm)
+
+        issue.state = to
+        self._put (issue)
+
+        return issue
+
+    def _positions (self, state_name):
+        # OUT: dict title -> positions in the state's bucket, built once
+        if state_name not in self._buckets:
+            return {}
+
+        titles = self._titles.get (state_name)
+        if titles is None:
+            titles = self._titles[state_name] = {}
+            for i, issue in enumerate (self._buckets[state_name]):
+                if issue is not None:
+                    titles.setdefault (issue.title, []).append (i)
+
+        return titles
+
+    def _compact (self, state_name):
+        # remove holes from the state's bucket, empty buckets are dropped
+        bucket = [i for i in self._buckets[state_name] if i is not None]
+        del self._holes[state_name]
+
+        if not bucket:
+            del self._buckets[state_name]
+            self._titles.pop (state_name, None)
+            return
+
+        self._buckets[state_name] = bucket
+        if state_name in self._titles:
+            del self._titles[state_name]
+            self._positions (state_name)
+
+    def __getstate__ (self):
+        # compact pickles (eg. from worker processes): titles per state
+        return {name: [i.title for i in self.in_state (name)] for name in list (self._buckets)}
+
+    def __setstate__ (self, state):
+        self._buckets = {
+            name: [Issue (title = title, state = name) for title in titles]
+            for name, titles in state.items()
+        }
+        self._count = sum (len (bucket) for bucket in self._buckets.values())
+        self._holes = {}
+        self._titles = {}
+        self._version = 0
+
+    def merge (self, issues):
+        # IN:  other Issues, appended bucket by bucket
+        for name in list (issues._buckets):
+            self._titles.pop (name, None)   # rebuilt by the next move()
+            self._buckets.setdefault (name, []).extend (issues.in_state (name))
+        self._count += len (issues)
+        self._version += 1
+
+    def in_state (self, state_name):
+        # IN:  state-name
+        # OUT: list of issues currently in this state
+        if state_name in self._holes:
+            self._compact (state_name)
+
+        return self._buckets.get (state_name, [])
+
+    def count (self, state_name):
+        return len (self._buckets.get (state_name, [])) - self._holes.get (state_name, 0)
+
+    def counts (self):
+        # OUT: dict state-name -> number of issues
+        return {name: self.count (name) for name in self._buckets}
+
+    def states (self):
+        # OUT: set of state-names having any issues
+        return set (self._buckets)
+
+    def orphaned_states (self, fsm):
+        # OUT: set of state-names having issues, but not known to the FSM
+        return {name for name in self._buckets if not fsm.known_state (name)}
+
+
 class Transition ():
 
+    __slots__ = ('_frm', '_to', '_input', '_none')
+
     def __init__ (self, **kwa):
         self._frm = kwa.get ('frm')
         self._to = kwa.get ('to')
@@ -67,6 +238,8 @@ class Transition ():
 
 class State ():
 
+    __slots__ = ('_name', '_events', '_is_start', '_is_end')
+
     def __init__ (self, **kwa):
         self._name     = kwa.get ('name')
         self._events   = kwa.get ('events') or []
@@ -118,6 +291,8 @@ class State ():
 
 class Event ():
 
+    __slots__ = ('_enter', '_next_state')
+
     def __init__ (self, **kwa):
         self._enter = kwa.get ('enter')
         self._next_state = kwa.get ('next_state')
@@ -144,13 +319,111 @@ class Event ():
     def next_state (self, next_state):
         self._next_state = next_state
 
+class Validation ():
+    """ result of a single validation pass over all states of an FSM
+
+        start_states ... states never entered
+        end_states ..... states never left
+        unreachable .... states not reachable from any start state
+        dead_ends ...... states no end state can be reached from
+    """
+
+    def __init__ (self, **kwa):
+        self._start_states = kwa.get ('start_states') or []
+        self._end_states   = kwa.get ('end_states') or []
+        self._unreachable  = kwa.get ('unreachable') or []
+        self._dead_ends    = kwa.get ('dead_ends') or []
+
+    def __repr__ (self):
+        return 'Validation (start_states={start}, end_states={end}, unreachable={unreachable}, dead_ends={dead_ends})'.format (
+            start       = [s.name for s in self.start_states],
+            end         = [s.name for s in self.end_states],
+            unreachable = [s.name for s in self.unreachable],
+            dead_ends   = [s.name for s in self.dead_ends],
+        )
+
+    @property
+    def start_states (self):
+        return self._start_states
+
+    @property
+    def end_states (self):
+        return self._end_states
+
+    @property
+    def unreachable (self):
+        return self._unreachable
+
+    @property
+    def dead_ends (self):
+        return self._dead_ends
+
+    @property
+    def error (self):
+        # OUT: error message for an invalid FSM, None otherwise
+        return self.check (len (self.start_states), len (self.end_states))
+
+    @staticmethod
+    def check (start_states, end_states):
+        # IN:  number of start and end states
+        # OUT: error message for an invalid FSM, None otherwise
+        if start_states == 0:
+            return 'missing start state'
+        if start_states > 1:
+            return 'multiple startstates'
+        if end_states == 0:
+            return 'missing end state'
+
+        return None
+
+
 class FSM ():
+    """ states are interned to dense integer ids (their position in
+        `states`), edges are kept as CSR style adjacency arrays: the
+        next states of state i are targets[offsets[i]:offsets[i + 1]],
+        sorted by name. the arrays are derived from the states' events
+        and rebuilt once per version.
+
+        in- and out-degrees (and with them start/end states) and the
+        set of transitions are kept up to date by add/remove_transition
+        in O(1), anything else changing states or events has them
+        recounted. the depth-first workflow is kept, too, as long as
+        added or removed transitions can't change it (see _unaffected),
+        otherwise it is recomputed when next used, as are the adjacency
+        arrays.
+
+        the workflow is ordered depth-first ('depth', the default) or
+        by strongly connected components ('topological', see
+        workflow())
+    """
+
+    ORDERS = ('depth', 'topological')
 
     def __init__ (self, **kwa):
         self._states = []
+        self._index = {}    # state-name -> id, kept in sync with _states
         self._start = []
         self._end = []
 
+        # bumped on every change to states or transitions, cached
+        # results are only valid for the version they were made for
+        self._version = 0
+        self._workflow = None
+        self._workflow_version = None
+        self._preorder = None   # id -> position in the depth-first workflow, -1 if not in it
+        self._order = None
+        self._validation = None
+        self._validation_version = None
+        self._offsets = None
+        self._targets = None
+        self._adjacency_version = None
+        self._indegree = array ('l')
+        self._outdegree = array ('l')
+        self._starts = 0    # number of states with in-degree 0
+        self._ends = 0      # number of states with out-degree 0
+        self._edges = {}    # (from-name, to-name) -> number of transitions
+        self._degrees_version = 0
+
         self._build_fsm (transitions = [
             Transition (
                 frm = t.get ('from'),
@@ -159,28 +432,306 @@ class FSM ():
             for t in kwa.get ('transitions')
         ])
 
+        self.order = kwa.get ('order') or 'depth'
+
 
     def known_state (self, state_name):
         # IN:  state-name
         # OUT: True if corresponding state exists
         #      False otherwise
-        return any (s for s in self.states if s.name == state_name)
+        return state_name in self._index
 
     def fetch_state (self, state_name):
         # IN:  state-name
         # OUT: corresponding, known state object
-        if not self.known_state (state_name):
+        try:
+            return self._states[self._index[state_name]]
+        except KeyError:
             raise LookupError ('can not fetch unknown state')
 
-        return [s for s in self.states if s.name == state_name].pop()
+    def state_id (self, state_name):
+        # IN:  state-name
+        # OUT: integer id of the known state
+        try:
+            return self._index[state_name]
+        except KeyError:
+            raise LookupError ('can not fetch unknown state')
 
     def create_or_fetch_state (self, state_name):
-        return self.known_state (state_name) and self.fetch_state (state_name) or State (name = state_name)
+        if self.known_state (state_name):
+            return self.fetch_state (state_name)
+
+        return State (name = state_name)
+
+    def add_state (self, state):
+        # IN:  state object, its name must not be known yet
+        if self.known_state (state.name):
+            raise LookupError ('state already known: <{}>'.format (state.name))
+
+        counted = self._counted ()
+        fresh = self._workflow_fresh ()
+
+        self._index[state.name] = len (self._states)
+        self._states.append (state)
+
+        # nothing leads to a new state, the workflow doesn't change
+        if fresh:
+            self._preorder.append (-1)
+
+        # a state without any events is both, a start and an end state
+        # (events given along are only counted by a full recount)
+        if counted and not state.events:
+            self._indegree.append (0)
+            self._outdegree.append (0)
+            self._starts += 1
+            self._ends += 1
+            state.is_start = state.is_end = True
+        else:
+            counted = False
+
+        self._changed (counted, fresh)
+
+    def remove_state (self, state_name):
+        # IN:  name of a known state no transitions refer to anymore
+        #      the last state takes over its id, no other ids change
+        i = self.state_id (state_name)
+        counted = self._counted ()
+        fresh = self._workflow_fresh () and self._preorder[i] == -1
+
+        if counted and (self._indegree[i] or self._outdegree[i]):
+            raise LookupError ('can not remove state with transitions: <{}>'.format (state_name))
+
+        if fresh:
+            self._preorder[i] = self._preorder[-1]
+            del self._preorder[-1]
+
+        last = self._states.pop()
+        del self._index[state_name]
+
+        if i < len (self._states):
+            self._states[i] = last
+            self._index[last.name] = i
+
+        if counted:
+            self._starts -= 1
+            self._ends -= 1
+            self._indegree[i] = self._indegree[-1]
+            self._outdegree[i] = self._outdegree[-1]
+            del self._indegree[-1]
+            del self._outdegree[-1]
+
+        self._changed (counted, fresh)
+
+    def add_transition (self, frm, to):
+        # IN:  names of the source and destination state, unknown
+        #      states are created. O(1)
+        to_state = self.create_or_fetch_state (to)
+        if not self.known_state (to):
+              self.add_state (to_state)
+
+        frm_state = self.create_or_fetch_state (frm)
+        if not self.known_state (frm):
+              self.add_state (frm_state)
+
+        counted = self._counted ()
+        fresh = self._unaffected (frm, to)
+
+        frm_state.add_event (Event (
+            enter = None,
+            next_state = to_state,
+        ))
+
+        if counted:
+            self._count (frm, to, +1)
+
+        self._changed (counted, fresh)
+
+    def remove_transition (self, frm, to):
+        # IN:  names of the source and destination state. O(degree)
+        events = self.fetch_state (frm).events
+        counted = self._counted ()
+
+        for i, event in enumerate (events):
+            if event.next_state.name == to:
+                fresh = self._unaffected (frm, to)
+                del events[i]
+
+                if counted:
+                    self._count (frm, to, -1)
+
+                self._changed (counted, fresh)
+                return
+
+        raise LookupError ('can not remove unknown transition <{}> -> <{}>'.format (frm, to))
+
+    def _count (self, frm_name, to_name, delta):
+        # update degrees, start/end flags and transitions for an added
+        # (+1) or removed (-1) transition between the given states
+        edge = (frm_name, to_name)
+        self._edges[edge] = self._edges.get (edge, 0) + delta
+        if not self._edges[edge]:
+            del self._edges[edge]
+
+        frm, to = self._index[frm_name], self._index[to_name]
+
+        self._ends -= self._outdegree[frm] == 0
+        self._outdegree[frm] += delta
+        self._ends += self._outdegree[frm] == 0
+        self._states[frm].is_end = self._outdegree[frm] == 0
+
+        self._starts -= self._indegree[to] == 0
+        self._indegree[to] += delta
+        self._starts += self._indegree[to] == 0
+        self._states[to].is_start = self._indegree[to] == 0
+
+    def patch (self, **kwa):
+        """ apply the given changes to the live FSM instead of building
+            a new one: transitions in `remove` are removed first, then
+            the ones in `add` are added (both lists of dicts as taken by
+            the constructor). states left without any transitions are
+            removed. editing costs O(degree) per transition. the
+            depth-first workflow is kept if no transition changes it,
+            other cached results (adjacency arrays, validation) are
+            rebuilt once, in O(states + transitions), when next used.
+
+            if the patched FSM is invalid, the changes are rolled back
+            and RuntimeWarning is raised
+        """
+
+        remove = [(t.get ('from'), t.get ('to')) for t in kwa.get ('remove') or []]
+        add = [(t.get ('from'), t.get ('to')) for t in kwa.get ('add') or []]
+
+        removed, added, created = [], [], set()
+
+        try:
+            for frm, to in remove:
+                self.remove_transition (frm, to)
+                removed.append ((frm, to))
+
+            for frm, to in add:
+                created.update (name for name in (frm, to) if not self.known_state (name))
+                self.add_transition (frm, to)
+                added.append ((frm, to))
+
+            self._drop_isolated ({name for edge in removed for name in edge})
+            self._check_fsm ()
+
+        except Exception:
+            for frm, to in reversed (added):
+                self.remove_transition (frm, to)
+            for name in created:
+                self.remove_state (name)
+            for frm, to in reversed (removed):
+                self.add_transition (frm, to)
+            raise
+
+    def _drop_isolated (self, state_names):
+        # remove those of the given states having no transitions left
+        indegree, outdegree = self._degrees ()
+
+        isolated = [
+            name for name in state_names
+            if self.known_state (name)
+                and not indegree[self.state_id (name)]
+                and not outdegree[self.state_id (name)]
+        ]
+        for name in isolated:
+            self.remove_state (name)
+
+    def invalidate (self):
+        # drop cached workflow and validation results, needs to be
+        # called after modifying states or events directly
+        self._version += 1
+
+    def _counted (self):
+        # OUT: True if the degree counters are up to date
+        return self._degrees_version == self._version
+
+    def _changed (self, counted, fresh = False):
+        # IN:  True if the degree counters were updated along with the
+        #      change, True if the cached workflow is still valid
+        self._version += 1
+        if counted:
+            self._degrees_version = self._version
+        if fresh:
+            self._workflow_version = self._version
+
+    def _workflow_fresh (self):
+        # OUT: True if the cached workflow is the depth-first one of the
+        #      current version
+        return self._workflow_version == self._version and self._preorder is not None
+
+    def _unaffected (self, frm, to):
+        """ return True if adding or removing a transition between the
+            given (known) states leaves the cached depth-first workflow
+            as it is: transitions from states it doesn't reach are never
+            followed, transitions to states it reached before their
+            source are always skipped (the target is visited already).
+            transitions into the workflow's start state (position 0)
+            never qualify, their source may become the start state. as
+            changes kept never lead into the start state, the start
+            state of a valid FSM stays the same. O(1)
+        """
+
+        if not self._workflow_fresh ():
+            return False
+
+        frm, to = self._preorder[self._index[frm]], self._preorder[self._index[to]]
+
+        return to != 0 and (frm == -1 or -1 < to <= frm)
+
+    def _degrees (self):
+        """ return (indegree, outdegree) arrays for the current version,
+            recounting them (and the states' start/end flags and the set
+            of transitions) if states or events were changed directly
+        """
+
+        if self._counted ():
+            return self._indegree, self._outdegree
+
+        index = self._index
+        states = self._states
+
+        indegree = array ('l', bytes (len (states) * array ('l').itemsize))
+        outdegree = array ('l', [len (state.events) for state in states])
+        edges = {}
+        for state in states:
+            for event in state.events:
+                indegree[index[event.next_state.name]] += 1
+                edge = (state.name, event.next_state.name)
+                edges[edge] = edges.get (edge, 0) + 1
+
+        for i, state in enumerate (states):
+            state.is_start = indegree[i] == 0
+            state.is_end = outdegree[i] == 0
+
+        self._indegree, self._outdegree = indegree, outdegree
+        self._edges = edges
+        self._starts = indegree.count (0)
+        self._ends = outdegree.count (0)
+        self._degrees_version = self._version
+
+        return indegree, outdegree
+
+    def has_transition (self, frm, to):
+        # IN:  names of the source and destination state
+        # OUT: True if the FSM has a transition frm -> to, O(1)
+        self._degrees ()
+
+        return (frm, to) in self._edges
+
+    @property
+    def version (self):
+        return self._version
 
     def fetch_start_state (self):
         # OUT: (first) start state, actually, only one start state is allowed
         # XXX run _check_fsm() here too ?
-        return [s for s in self.states if s.is_start].pop()
+        indegree, outdegree = self._degrees ()
+        try:
+            return self._states[indegree.index (0)]
+        except ValueError:
+            raise IndexError ('no start state')
 
     def _build_fsm (self, **kwa):
         """ build the FSM based on given transitions
@@ -188,55 +739,160 @@ class FSM ():
             is assumed to be both, being the source/destination of
             an transition invalidates the state as end/start state
             respectively. start and end states will remain (for
-            valid inputs).
+            valid inputs). this is done by counting in- and
+            out-degrees along the way
         """
 
-        for t in kwa.get ('transitions'):
-            to_state  = self.create_or_fetch_state (t.to)
-            frm_state = self.create_or_fetch_state (t.frm)
+        with stats.phase ('fsm build'):
+            for t in kwa.get ('transitions'):
+                self.add_transition (t.frm, t.to)
 
-            if not self.known_state (t.to):
-                  self.states.append (to_state)
+            stats.count ('transitions built', len (kwa.get ('transitions')))
+            self._check_fsm ()
 
-            if not self.known_state (t.frm):
-                  self.states.append (frm_state)
+    def _adjacency (self):
+        """ return (offsets, targets, indegree) arrays for the current
+            version, rebuilding them if states or transitions changed
+        """
 
-            to_state.is_start = False
-            frm_state.is_end = False
+        indegree, outdegree = self._degrees ()
 
-            frm_state.add_event (Event (
-                enter = None,
-                next_state = to_state,
-            ))
+        if self._adjacency_version == self._version:
+            return self._offsets, self._targets, indegree
 
-        self._check_fsm ()
+        index = self._index
+        states = self._states
+
+        offsets = array ('l', [0])
+        targets = array ('l')
+        for state in states:
+            if len (state.events) == 1:
+                targets.append (index[state.events[0].next_state.name])
+            elif state.events:
+                targets.extend (sorted (
+                    (index[e.next_state.name] for e in state.events),
+                    key = lambda i: states[i].name,
+                ))
+            offsets.append (len (targets))
+
+        self._offsets, self._targets = offsets, targets
+        self._adjacency_version = self._version
+
+        return offsets, targets, indegree
+
+    def adjacency (self):
+        # OUT: (offsets, targets) arrays of the current version: the next
+        #      states of the state with id i (its position in `states`)
+        #      are targets[offsets[i]:offsets[i + 1]]. not to be modified
+        offsets, targets, indegree = self._adjacency ()
+
+        return offsets, targets
 
     def workflow (self):
         """ create and return a list representing the workflow
             based on state transitions. workflow is found depth-first
-            and alphabetically for alternative paths
+            and alphabetically for alternative paths. ordered
+            'topological', states reachable from each other (loops)
+            are kept together and come after all states leading to
+            them, depth-first and alphabetically among themselves
+            (see analytics.workflow_order). the result is cached until
+            states, transitions or the order change
         """
 
-        # ISA pure function
-        def _wf (state, states = []):
-            # keep this state
-            states.append (state)
-
-            # recursively process any yet unknown next_states
-            for event in sorted (state.events, key = lambda e: e.next_state.name):
-                if event.next_state not in states:
-                    _wf (event.next_state, states)
-
-            return states
+        # iterative depth-first search over the adjacency arrays: the
+        # stack holds every state id on the current path along with
+        # the position of its next unvisited target
+        def _wf (start):
+            offsets, targets, indegree = self._adjacency ()
+
+            order = [start]
+            visited = bytearray (len (self._states))
+            visited[start] = 1
+            stack = [start]
+            positions = [offsets[start]]
+
+            while stack:
+                pos, end = positions[-1], offsets[stack[-1] + 1]
+                while pos < end and visited[targets[pos]]:
+                    pos += 1
+
+                if pos == end:
+                    stack.pop()
+                    positions.pop()
+                    continue
+
+                positions[-1] = pos + 1
+                nxt = targets[pos]
+                visited[nxt] = 1
+                order.append (nxt)
+                stack.append (nxt)
+                positions.append (offsets[nxt])
+
+            preorder = array ('l', [-1]) * len (self._states)
+            for position, i in enumerate (order):
+                preorder[i] = position
+
+            return [self._states[i] for i in order], preorder
 
         if not self.states:
             raise RuntimeWarning ('no states')
 
         self._check_fsm ()
 
-        return _wf (self.fetch_start_state())
+        if self._workflow_version != self._version:
+            start = self.state_id (self.fetch_start_state().name)
+            with stats.phase ('fsm workflow'):
+                if self._order == 'topological':
+                    offsets, targets, indegree = self._adjacency ()
+                    self._workflow = [self._states[i] for i in analytics.workflow_order (
+                        len (self._states), offsets, targets, start, [s.name for s in self._states]
+                    )]
+                    self._preorder = None
+                else:
+                    self._workflow, self._preorder = _wf (start)
+            self._workflow_version = self._version
+
+        return list (self._workflow)
+
+
+    def reachable (self, state_name = None):
+        """ return all states reachable from the given state (the
+            start state by default), including itself, in linear time
+        """
+
+        if state_name is None:
+            start = self.state_id (self.fetch_start_state().name)
+        else:
+            start = self.state_id (state_name)
+
+        offsets, targets, indegree = self._adjacency ()
+        reached = self._reach ([start], offsets, targets)
+
+        return [s for i, s in enumerate (self._states) if reached[i]]
+
+    def unreachable (self, state_name = None):
+        # OUT: states not reachable from the given (or the start) state,
+        #      these are never part of the workflow
+        reached = set (self.reachable (state_name))
+
+        return [s for s in self._states if s not in reached]
 
 
+    @property
+    def order (self):
+        return self._order
+
+    @order.setter
+    def order (self, order):
+        # IN:  one of ORDERS, the workflow is recomputed on next use
+        if order not in self.ORDERS:
+            raise RuntimeWarning ('invalid workflow order: <{}>'.format (order))
+
+        if order != self._order:
+            self._order = order
+            self._workflow_version = None
+            self._preorder = None
+
     @property
     def transitions (self):
         return self._transitions
@@ -252,6 +908,8 @@ class FSM ():
     @states.setter
     def states (self, states):
         self._states = states
+        self._index = {s.name: i for i, s in enumerate (states)}
+        self.invalidate ()
 
     def __repr__ (self):
         return "FSM (states={states}".format (
@@ -260,15 +918,88 @@ class FSM ():
 
     def _check_fsm (self):
         """ a valid FSM must have exactly one start state and
-            one or more end states, YMMV
+            one or more end states, YMMV. O(1) as long as the
+            degrees are up to date
         """
 
-        start_states = [s for s in self.states if s.is_start]
-        end_states = [s for s in self.states if s.is_end]
+        self._degrees ()
+
+        error = Validation.check (self._starts, self._ends)
+        if error:
+            raise RuntimeWarning (error)
 
-        if len (start_states) == 0:
-            raise RuntimeWarning ('missing start state')
-        if len (start_states) > 1:
-            raise RuntimeWarning ('multiple startstates')
-        if len (end_states) == 0:
-            raise RuntimeWarning ('missing end state')
+    def validate (self):
+        """ return a Validation of the current version, computed by two
+            linear searches over the adjacency arrays (forward from the
+            start states, backwards from the end states). start and end
+            states, and states either search missed, are picked from the
+            degree arrays and search results in C (compress), the
+            searches are the only loops over states in python
+        """
+
+        if self._validation_version == self._version:
+            return self._validation
+
+        with stats.phase ('fsm validate'):
+            offsets, targets, indegree = self._adjacency ()
+            outdegree = self._outdegree
+            ids = range (len (self._states))
+
+            starts = list (compress (ids, map (not_, indegree)))
+            ends = list (compress (ids, map (not_, outdegree)))
+
+            reached = self._reach (starts, offsets, targets)
+            reaching = self._reach (ends, *self._reverse (offsets, targets, indegree))
+
+            self._validation = Validation (
+                start_states = list (map (self._states.__getitem__, starts)),
+                end_states   = list (map (self._states.__getitem__, ends)),
+                unreachable  = list (compress (self._states, map (not_, reached))),
+                dead_ends    = list (compress (self._states, map (not_, reaching))),
+            )
+        self._validation_version = self._version
+
+        return self._validation
+
+    def _reach (self, starts, offsets, targets):
+        # IN:  state ids to start from, CSR adjacency arrays
+        # OUT: bytearray, 1 for every state id reachable from starts
+        reached = bytearray (len (offsets) - 1)
+        pending = list (starts)
+        for i in pending:
+            reached[i] = 1
+
+        # states with a single next state (chains) are followed without
+        # slicing the targets
+        pop, push = pending.pop, pending.append
+        while pending:
+            i = pop ()
+            first, end = offsets[i], offsets[i + 1]
+            if end - first == 1:
+                j = targets[first]
+                if not reached[j]:
+                    reached[j] = 1
+                    push (j)
+                continue
+
+            for j in targets[first:end]:
+                if not reached[j]:
+                    reached[j] = 1
+                    push (j)
+
+        return reached
+
+    def _reverse (self, offsets, targets, indegree):
+        # IN:  CSR adjacency arrays, in-degree of every state
+        # OUT: CSR adjacency arrays with all edges reversed
+        outdegree = map (sub, offsets[1:], offsets)
+        sources = list (chain.from_iterable (map (repeat, range (len (offsets) - 1), outdegree)))
+
+        # stable sort of all edge positions by target, done in C
+        order = sorted (range (len (targets)), key = targets.__getitem__)
+
+        rev_offsets = array ('l', [0])
+        rev_offsets.extend (accumulate (indegree))
+        rev_targets = array ('l', map (sources.__getitem__, order))
+
+        return rev_offsets, rev_targets
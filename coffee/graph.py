@@ -1,33 +1,179 @@
-from graphviz import Digraph
-import tempfile
-import subprocess
+""" drawing the FSM: DOT is written in-process (and streamed to any
+    file object), ASCII is laid out in-process too. only SVG needs
+    graphviz' `dot` to render the DOT source
+"""
+
+import os
+import sys
+import textwrap
 
-from coffee.coffee import FSM
 
 def graph (**kwa):
+    # IN:  fsm, fmt ('svg', 'ascii' or 'dot'), source_files, out (file
+    #      object for ascii and dot, default stdout), view (svg only)
+    # OUT: path of the SVG file for fmt 'svg', None otherwise
     fsm  = kwa.get ('fsm')
     fmt  = kwa.get ('fmt')
+    out  = kwa.get ('out') or sys.stdout
 
-    if fmt not in 'svg ascii'.split():
+    if fmt not in 'svg ascii dot'.split():
         raise RuntimeWarning ('invalid format: <{}>'.format (fmt))
 
-    g = Digraph ('FSM', format  = 'svg')
-    g.attr (rankdir = 'LR')
+    # how to overengineer: strategy pattern :-)
+    if fmt == 'svg':
+        return render_svg (fsm, kwa.get ('source_files') or [], view = kwa.get ('view'))
+    elif fmt == 'ascii':
+        write_ascii (fsm, out)
+    elif fmt == 'dot':
+        write_dot (fsm, out, kwa.get ('source_files') or [])
+
+
+def write_dot (fsm, out, source_files = ()):
+    # IN:  FSM, file object to write the DOT source to, state by state
+    out.write ('// FSM from: {}\n'.format (', '.join (source_files) or '-'))
+    out.write ('digraph FSM {\n\trankdir=LR\n')
 
     for node in fsm.states:
+        lines = []
         if node.is_start:
-            g.node (node.name, label = node.name, shape = 'doublecircle')
+            lines.append ('\t{0} [label={0} shape=doublecircle]\n'.format (_quoted (node.name)))
         elif node.is_end:
-            g.node (node.name, label = node.name)
+            lines.append ('\t{0} [label={0}]\n'.format (_quoted (node.name)))
         for edge in node.events:
-            g.edge (node.name, edge.next_state.name)
+            lines.append ('\t{} -> {}\n'.format (_quoted (node.name), _quoted (edge.next_state.name)))
 
-    # how to overengineer: strategy pattern :-)
-    if fmt == 'svg':
-        g.render (view = True)
-    elif fmt == 'ascii':
-        g.render (view = False)
-        print (subprocess.run (
-            'graph-easy FSM.gv'.split(),
-            stdout = subprocess.PIPE,
-        ).stdout.decode())
+        out.write (''.join (lines))
+
+    out.write ('}\n')
+
+
+def _quoted (name):
+    return '"{}"'.format (name.replace ('\\', '\\\\').replace ('"', '\\"'))
+
+
+def render_svg (fsm, source_files = (), view = False):
+    """ write the DOT source to a new temporary directory (concurrent
+        runs don't overwrite each other's files) and render it with
+        graphviz' `dot`. returns the path of the SVG file, which is
+        opened in a viewer if asked to
+    """
+
+    import subprocess
+    import tempfile
+
+    directory = tempfile.mkdtemp (prefix = 'coffee-')
+    source = os.path.join (directory, 'FSM.gv')
+    svg = source + '.svg'
+
+    with open (source, 'w') as f:
+        write_dot (fsm, f, source_files)
+
+    try:
+        subprocess.run (['dot', '-Tsvg', '-o', svg, source], check = True)
+    except FileNotFoundError:
+        raise RuntimeWarning ('can\'t find `dot` (graphviz), DOT source is in <{}>'.format (source))
+
+    if view:
+        import webbrowser
+
+        webbrowser.open ('file://{}'.format (svg))
+
+    return svg
+
+
+def layers (fsm):
+    """ return (layers, unreachable states): layers are lists of
+        states, the start state(s) first, then every state in the
+        layer after the nearest state leading to it (breadth first,
+        next states by name)
+    """
+
+    states = {s.name: s for s in fsm.states}
+    layer_of = {}
+
+    current = sorted ((s for s in fsm.states if s.is_start), key = lambda s: s.name)
+    for s in current:
+        layer_of[s.name] = 0
+
+    result = []
+    while current:
+        result.append (current)
+        following = []
+        for state in current:
+            for name in sorted (e.next_state.name for e in state.events):
+                if name not in layer_of:
+                    layer_of[name] = len (result)
+                    following.append (states[name])
+        current = following
+
+    return result, [s for s in fsm.states if s.name not in layer_of]
+
+
+def write_ascii (fsm, out, width = 78):
+    """ draw the FSM layer by layer (see layers()) to the given file
+        object: a row of boxes per layer, wrapped at `width`, followed
+        by the transitions leaving the layer's states
+    """
+
+    layered, unreachable = layers (fsm)
+    layer_of = {s.name: n for n, layer in enumerate (layered + [unreachable]) for s in layer}
+
+    out.write ('\n')
+    for n, layer in enumerate (layered + [unreachable]):
+        if n == len (layered):
+            if not layer:
+                break
+            out.write ('\n  (not reachable)\n')
+        elif n:
+            out.write ('    |\n    v\n')
+
+        for row in _rows ([_label (s) for s in layer], width - 2):
+            edge = '  ' + '  '.join ('+{}+'.format ('-' * len (label)) for label in row) + '\n'
+            out.write (''.join ([
+                edge,
+                '  ' + '  '.join ('|{}|'.format (label) for label in row) + '\n',
+                edge,
+            ]))
+
+        for state in layer:
+            if state.events:
+                out.write ('\n'.join (textwrap.wrap (
+                    '{} -> {}'.format (state.name, ', '.join (
+                        ('^' if layer_of[name] <= n else '') + name
+                        for name in sorted (e.next_state.name for e in state.events)
+                    )),
+                    width,
+                    initial_indent    = '    ',
+                    subsequent_indent = '        ',
+                    break_on_hyphens  = False,
+                )) + '\n')
+
+    out.write ('\n')
+    out.write ('(S) ... state is a start state\n')
+    out.write ('(E) ... state is an end state\n')
+    out.write ('^   ... transition back to an earlier (or the same) layer\n')
+    out.write ('\n')
+
+
+def _label (state):
+    return ' {name}{is_start}{is_end} '.format (
+        name     = state.name,
+        is_start = ' (S)' if state.is_start else '',
+        is_end   = ' (E)' if state.is_end else '',
+    )
+
+
+def _rows (labels, width):
+    # OUT: labels split into rows of boxes fitting into width (but
+    #      at least one box per row)
+    row, used = [], 0
+    for label in labels:
+        size = len (label) + 4  # borders and spacing
+        if row and used + size > width:
+            yield row
+            row, used = [], 0
+        row.append (label)
+        used += size
+
+    if row:
+        yield row
@@ -0,0 +1,139 @@
+""" streaming input: records are yielded one at a time while parsing,
+    neither the whole document nor lists of all records are built.
+
+    supported are YAML files with top-level keys (eg. ``transitions``,
+    ``issues``) holding lists of flat mappings, and JSON Lines files
+    holding one issue per line
+"""
+
+import sys
+
+# note: yaml and json are imported by the functions using them, importing
+# yaml alone is a large part of the start-up time
+
+
+def safe_loader ():
+    # OUT: (loader, name), libyaml's C implementation is much faster
+    #      than the pure-python scanner, but may not be available
+    import yaml
+
+    try:
+        return yaml.CSafeLoader, 'libyaml'
+    except AttributeError:
+        return yaml.SafeLoader, 'pure-python yaml'
+
+
+def iter_jsonl (fileobj):
+    # IN:  file object, one JSON object per line, empty lines are skipped
+    # OUT: generator of dicts
+    import json
+
+    for number, line in enumerate (fileobj, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads (line)
+        except ValueError as e:
+            raise RuntimeWarning ('invalid JSON in line {}: {}'.format (number, e))
+
+        if type (record) != dict:
+            raise RuntimeWarning ('invalid record in line {}'.format (number))
+
+        yield _interned (record)
+
+
+def iter_yaml (fileobj, loader = None):
+    """ parse given YAML stream using the event API and yield
+        (top-level key, record) for every mapping found in a list
+        below a top-level key. any other values are skipped.
+        scalars are yielded as strings, no type resolution is done.
+        uses the fastest safe loader available by default
+    """
+
+    import yaml
+
+    events = yaml.parse (fileobj, Loader = loader or safe_loader()[0])
+
+    _expect (events, yaml.StreamStartEvent)
+    _expect (events, yaml.DocumentStartEvent)
+    _expect (events, yaml.MappingStartEvent)
+
+    for event in events:
+        if isinstance (event, yaml.MappingEndEvent):
+            return
+
+        key = event.value if isinstance (event, yaml.ScalarEvent) else None
+        if key is None:
+            _skip (events, event)
+
+        value = next (events)
+        if key is None or not isinstance (value, yaml.SequenceStartEvent):
+            _skip (events, value)
+            continue
+
+        for item in events:
+            if isinstance (item, yaml.SequenceEndEvent):
+                break
+
+            if isinstance (item, yaml.MappingStartEvent):
+                yield key, _interned (_read_mapping (events))
+            else:
+                _skip (events, item)
+
+
+def _expect (events, event_type):
+    import yaml
+
+    event = next (events, None)
+    if not isinstance (event, event_type):
+        raise RuntimeWarning ('can\'t load data')
+
+    return event
+
+
+def _skip (events, event):
+    # skip the whole (possibly nested) node starting with the given event
+    import yaml
+
+    if not isinstance (event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+        return
+
+    depth = 1
+    for event in events:
+        if isinstance (event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+            depth += 1
+        elif isinstance (event, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+            depth -= 1
+            if not depth:
+                return
+
+
+def _read_mapping (events):
+    import yaml
+
+    # OUT: dict of the (scalar) key/value pairs of a flat mapping
+    record = {}
+
+    for event in events:
+        if isinstance (event, yaml.MappingEndEvent):
+            return record
+
+        value = next (events)
+        if isinstance (event, yaml.ScalarEvent) and isinstance (value, yaml.ScalarEvent):
+            record[event.value] = value.value
+        else:
+            _skip (events, event)
+            _skip (events, value)
+
+    return record
+
+
+def _interned (record):
+    # the same few state names are repeated for every issue, share them
+    for key in ('state', 'from', 'to'):
+        if isinstance (record.get (key), str):
+            record[key] = sys.intern (record[key])
+
+    return record
@@ -0,0 +1,101 @@
+""" issue moves: an append-only log of issues changing state
+
+    every move (issue title, from state, to state) is checked against
+    the FSM's transitions and applied to the grouping of issues right
+    away, O(1) each, instead of reloading all issues. moves can be
+    given as JSON Lines, one move per line, eg.
+
+        {"title": "Make coffee", "from": "doing", "to": "done"}
+"""
+
+from coffee.ingest import iter_jsonl
+
+
+class Move ():
+
+    __slots__ = ('_title', '_frm', '_to')
+
+    def __init__ (self, **kwa):
+        self._title = kwa.get ('title')
+        self._frm = kwa.get ('frm')
+        self._to = kwa.get ('to')
+
+    def __repr__ (self):
+        return 'Move (title="{title}", frm="{frm}", to="{to}")'.format (
+            title = self.title,
+            frm   = self.frm,
+            to    = self.to,
+        )
+
+    @property
+    def title (self):
+        return self._title
+
+    @property
+    def frm (self):
+        return self._frm
+
+    @property
+    def to (self):
+        return self._to
+
+
+class Moves ():
+    """ moves applied to the given issues, in the order they were
+        applied. moves are validated against the given FSM, invalid
+        moves are rejected and leave issues unchanged
+    """
+
+    def __init__ (self, **kwa):
+        self._fsm = kwa.get ('fsm')
+        self._issues = kwa.get ('issues')
+        self._moves = []
+
+    def __repr__ (self):
+        return 'Moves (count={count})'.format (count = len (self))
+
+    def __len__ (self):
+        return len (self._moves)
+
+    def __iter__ (self):
+        return iter (self._moves)
+
+    @property
+    def fsm (self):
+        return self._fsm
+
+    @property
+    def issues (self):
+        return self._issues
+
+    def append (self, move):
+        # IN:  Move along a transition of the FSM, of an issue currently
+        #      in the move's from state
+        if not self._fsm.has_transition (move.frm, move.to):
+            raise RuntimeWarning ('invalid move of <{}>: no transition <{}> -> <{}>'.format (
+                move.title, move.frm, move.to,
+            ))
+
+        self._issues.move (move.title, move.frm, move.to)
+        self._moves.append (move)
+
+    def ingest (self, fileobj):
+        """ apply the moves read from the given file object (JSON Lines)
+            and return their number. reading stops at the first invalid
+            move, moves before it remain applied
+        """
+
+        count = 0
+        for record in iter_jsonl (fileobj):
+            try:
+                self.append (Move (
+                    title = record.get ('title'),
+                    frm   = record.get ('from'),
+                    to    = record.get ('to'),
+                ))
+            except (LookupError, RuntimeWarning) as e:
+                raise RuntimeWarning ('move {}: {}'.format (count + 1, e))
+
+            count += 1
+
+        return count
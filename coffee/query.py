@@ -0,0 +1,290 @@
+""" queries over issues. a query is compiled once into a Query, which
+    answers from the grouping of issues by state and a trigram index of
+    titles instead of scanning all issues. clauses are
+
+        state <name>        issues in the given state
+        reachable <name>    issues in states reachable from the given one
+                            (including itself)
+        title <regex>       issues with titles matching (re.search)
+        count               the number of matching issues per state
+
+    all clauses must match, names containing spaces are quoted, eg.
+
+        state doing title '^Make'
+        reachable "on hold" title coff?ee count
+"""
+
+import re
+import weakref
+
+from array import array
+
+from coffee import stats
+
+
+class Query ():
+    """ compiled query: the states to look at (None for all), the
+        title regex (or None) and the literal strings every matching
+        title must contain (lowercase), used to look up candidates in
+        the title index
+    """
+
+    def __init__ (self, **kwa):
+        self._states = kwa.get ('states')
+        self._title = kwa.get ('title')
+        self._literals = kwa.get ('literals') or []
+        self._count = kwa.get ('count') or False
+
+    def __repr__ (self):
+        return 'Query (states={states}, title={title}, literals={literals}, count={count})'.format (
+            states   = sorted (self.states) if self.states is not None else None,
+            title    = self.title.pattern if self.title else None,
+            literals = self.literals,
+            count    = self.count,
+        )
+
+    @property
+    def states (self):
+        return self._states
+
+    @property
+    def title (self):
+        return self._title
+
+    @property
+    def literals (self):
+        return self._literals
+
+    @property
+    def count (self):
+        return self._count
+
+    def run (self, issues):
+        """ return dict state-name -> list of matching issues (or their
+            number for count queries), for states having any. without
+            a title, issues come straight from their states' groups.
+            with one, candidates come from the title index, unless the
+            states' groups are smaller
+        """
+
+        states = self.states if self.states is not None else issues.states()
+
+        if not self.title:
+            if self.count:
+                return {name: issues.count (name) for name in states if issues.count (name)}
+            return {name: list (issues.in_state (name)) for name in states if issues.count (name)}
+
+        search = self.title.search
+        scanned = sum (issues.count (name) for name in states)
+
+        candidates = None
+        if self.literals:
+            candidates = title_index (issues).candidates (self.literals, scanned)
+
+        if candidates is None:
+            candidates = (issue for name in states for issue in issues.in_state (name))
+        elif self.states is not None:
+            candidates = (issue for issue in candidates if issue.state in states)
+
+        result = {}
+        for issue in candidates:
+            if issue.title is not None and search (str (issue.title)):
+                result.setdefault (issue.state, []).append (issue)
+
+        if self.count:
+            return {name: len (matching) for name, matching in result.items()}
+
+        return result
+
+
+def compile (text, fsm = None):
+    """ compile the given query text (see above) into a Query. the FSM
+        is needed for `reachable` only
+    """
+
+    import shlex
+
+    try:
+        words = shlex.split (text or '')
+    except ValueError as e:
+        raise RuntimeWarning ('invalid query: {}'.format (e))
+
+    states, title, literals, count = None, None, [], False
+
+    while words:
+        clause = words.pop (0)
+
+        if clause == 'count':
+            count = True
+            continue
+
+        if clause not in ('state', 'reachable', 'title'):
+            raise RuntimeWarning ('invalid query clause: <{}>'.format (clause))
+        if not words:
+            raise RuntimeWarning ('missing argument to <{}>'.format (clause))
+
+        argument = words.pop (0)
+
+        if clause == 'title':
+            try:
+                title = re.compile (argument)
+            except re.error as e:
+                raise RuntimeWarning ('invalid regex <{}>: {}'.format (argument, e))
+            literals = required_literals (argument)
+            continue
+
+        if clause == 'state':
+            selected = {argument}
+        else:
+            if not fsm:
+                raise RuntimeWarning ('no FSM loaded to find reachable states')
+            selected = {s.name for s in fsm.reachable (argument)}
+
+        states = selected if states is None else states & selected
+
+    return Query (states = states, title = title, literals = literals, count = count)
+
+
+# inline flags, eg. (?i) or (?x:...), and repetitions, eg. {2} or {1,3}
+_FLAGS = re.compile (r'\(\?[aiLmsux-]+[:)]')
+_REPEAT = re.compile (r'\{\d*(,\d*)?\}')
+
+
+def required_literals (pattern, size = 3):
+    """ return (lowercase) strings of at least `size` characters that
+        every string matching the regex contains. conservative: only
+        plain characters outside of groups and classes are taken, none
+        at all if there are alternatives or inline flags (eg. `(?x)`
+        changes what plain characters mean)
+    """
+
+    if '|' in pattern or _FLAGS.search (pattern):
+        return []
+
+    runs, run = [], []
+    depth = 0
+    i = 0
+
+    def _flush ():
+        if len (run) >= size:
+            runs.append (''.join (run).lower())
+        run.clear()
+
+    while i < len (pattern):
+        c = pattern[i]
+
+        if c == '\\':
+            escaped = pattern[i + 1:i + 2]
+            i += 2
+            if escaped and not escaped.isalnum() and not depth:
+                run.append (escaped)
+            else:
+                _flush ()
+            continue
+
+        if c == '[':
+            # skip the class, a leading ']' (or '^]') is part of it
+            _flush ()
+            i += 1
+            if pattern[i:i + 1] == '^':
+                i += 1
+            if pattern[i:i + 1] == ']':
+                i += 1
+            while i < len (pattern) and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+            i += 1
+            continue
+
+        quantifier = _REPEAT.match (pattern, i) if c == '{' else None
+        if quantifier:
+            # {m,n} or {n}: skip it, the preceding character may be
+            # missing (or repeated)
+            if run:
+                run.pop()
+            _flush ()
+            i = quantifier.end()
+            continue
+
+        if c in '?*':
+            # the preceding character is optional
+            if run:
+                run.pop()
+            _flush ()
+        elif c == '(':
+            _flush ()
+            depth += 1
+        elif c == ')':
+            depth = max (depth - 1, 0)
+        elif c in '+.^$':
+            _flush ()
+        elif not depth:
+            run.append (c)
+
+        i += 1
+
+    _flush ()
+
+    return runs
+
+
+class TitleIndex ():
+    """ trigram index of (lowercase) titles: for every trigram the ids
+        of issues whose title contains it
+    """
+
+    def __init__ (self, issues):
+        self._version = issues.version
+        self._items = [issue for issue in issues if issue.title is not None]
+        self._postings = {}
+
+        postings = self._postings
+        for n, issue in enumerate (self._items):
+            title = str (issue.title).lower()
+            for gram in {title[i:i + 3] for i in range (len (title) - 2)}:
+                ids = postings.get (gram)
+                if ids is None:
+                    ids = postings[gram] = array ('I')
+                ids.append (n)
+
+    def __len__ (self):
+        return len (self._items)
+
+    @property
+    def version (self):
+        return self._version
+
+    def candidates (self, literals, limit = None):
+        """ return issues whose titles contain all trigrams of the shortest
+            postings list of the given literals' trigrams, ie. a superset
+            of the issues containing all literals. returns None if there
+            would be more than `limit` candidates
+        """
+
+        shortest = None
+        for literal in literals:
+            for i in range (len (literal) - 2):
+                ids = self._postings.get (literal[i:i + 3])
+                if ids is None:
+                    return []
+                if shortest is None or len (ids) < len (shortest):
+                    shortest = ids
+
+        if shortest is None or (limit is not None and len (shortest) > limit):
+            return None
+
+        items = self._items
+        return [items[n] for n in shortest]
+
+
+# title indexes, built on first use and kept until issues are added
+_indexes = weakref.WeakKeyDictionary()
+
+
+def title_index (issues):
+    # OUT: TitleIndex of the given issues, up to date
+    index = _indexes.get (issues)
+    if index is None or index.version != issues.version:
+        with stats.phase ('title index'):
+            index = _indexes[issues] = TitleIndex (issues)
+
+    return index
@@ -0,0 +1,221 @@
+""" reports of issues grouped by the states of the workflow: the text
+    printed by `print` and exports for other tools
+
+        text        as printed by `print` (optionally a summary or a
+                    page of n issues per state)
+        csv         state,title per issue, with a header line
+        jsonl       one issue per line, as read by `load`
+        markdown    a section per state listing its issues
+
+    issues are written state by state in workflow order, states not in
+    the workflow (unreachable or unknown to the FSM) are left out.
+    output is collected in large chunks and written in bulk, lines are
+    built per state (joined) rather than per issue
+"""
+
+import sys
+
+from operator import attrgetter
+
+
+FORMATS = ('text', 'csv', 'jsonl', 'markdown')
+
+
+class Writer ():
+    """ buffered writer: text is collected and written to the file
+        object joined, whenever `size` characters have come together
+        (and when flushed or closed as context manager)
+    """
+
+    def __init__ (self, out = None, size = 1 << 18):
+        self._out = out or sys.stdout
+        self._size = size
+        self._chunks = []
+        self._buffered = 0
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *exc):
+        self.flush ()
+        return False
+
+    def write (self, text):
+        self._chunks.append (text)
+        self._buffered += len (text)
+        if self._buffered >= self._size:
+            self.flush ()
+
+    def flush (self):
+        if self._chunks:
+            self._out.write (''.join (self._chunks))
+            self._chunks.clear()
+            self._buffered = 0
+
+
+def write (fsm, issues, out = None, fmt = 'text', **kwa):
+    # IN:  FSM, Issues, file object (default stdout), one of FORMATS,
+    #      options of the text format (see write_text)
+    if fmt not in FORMATS:
+        raise RuntimeWarning ('invalid format: <{}>'.format (fmt))
+
+    with Writer (out) as writer:
+        if fmt == 'text':
+            write_text (fsm, issues, writer, **kwa)
+        elif fmt == 'csv':
+            write_csv (fsm, issues, writer)
+        elif fmt == 'jsonl':
+            write_jsonl (fsm, issues, writer)
+        elif fmt == 'markdown':
+            write_markdown (fsm, issues, writer)
+
+
+def write_text (fsm, issues, out, summary = False, limit = None, page = 1):
+    """ write issues per state as `print` does: all of them, the first
+        `limit` (the given page of them), or with `summary` the number
+        and share of issues per state along with the first `limit`
+    """
+
+    first = (max (page, 1) - 1) * limit if limit else 0
+
+    workflow = fsm.workflow()
+    labels = [_label (state) for state in workflow]
+    width = max (len (label) for label in labels)
+    total = len (issues)
+
+    out.write ('\n')
+    for state, label in zip (workflow, labels):
+        count = issues.count (state.name)
+
+        if summary:
+            out.write ('  (*) {label:<{width}} {count:>9} {percent:6.1f}%\n'.format (
+                label   = label,
+                width   = width,
+                count   = count,
+                percent = 100.0 * count / total,
+            ))
+        else:
+            out.write ('  (*) {}\n'.format (label))
+
+        selected = issues.in_state (state.name)
+        if limit is not None:
+            selected = selected[first:first + limit]
+
+        if selected:
+            out.write ('    (-) ')
+            out.write ('\n    (-) '.join (_titles (selected)))
+            out.write ('\n')
+
+        if limit and count > first + limit:
+            out.write ('    (+) {} more\n'.format (count - first - len (selected)))
+
+    if summary:
+        listed = sum (issues.count (state.name) for state in workflow)
+        out.write ('\n  {total} issues, {other} not in the workflow (see `unreachable`)\n'.format (
+            total = total,
+            other = total - listed,
+        ))
+
+    out.write ('\n')
+    out.write ('(S) ... state is a start state\n')
+    out.write ('(E) ... state is an end state\n')
+    out.write ('\n')
+
+
+def write_csv (fsm, issues, out):
+    """ one line per issue: state,title, quoted as needed (RFC 4180).
+        titles of a state are joined into lines at once unless any of
+        them needs quoting, the csv module formats those
+    """
+
+    import csv
+    import io
+
+    out.write ('state,title\n')
+
+    for state in fsm.workflow():
+        selected = issues.in_state (state.name)
+        if not selected:
+            continue
+
+        titles = _titles (selected)
+        joined = '\n'.join (titles)
+        if ',' in joined or '"' in joined or '\r' in joined or joined.count ('\n') != len (titles) - 1:
+            buffer = io.StringIO()
+            name = state.name
+            csv.writer (buffer, lineterminator = '\n').writerows ((name, title) for title in titles)
+            out.write (buffer.getvalue())
+            continue
+
+        buffer = io.StringIO()
+        csv.writer (buffer, lineterminator = '').writerow ((state.name,))
+        prefix = buffer.getvalue() + ','
+
+        out.write (prefix)
+        out.write (('\n' + prefix).join (titles))
+        out.write ('\n')
+
+
+def write_jsonl (fsm, issues, out):
+    # one issue per line, eg. {"title": "Make coffee", "state": "doing"}
+    import json
+
+    from json.encoder import encode_basestring_ascii
+
+    def _dumps (value):
+        # strings directly by the encoder json.dumps uses for them
+        return encode_basestring_ascii (value) if type (value) is str else json.dumps (value)
+
+    for state in fsm.workflow():
+        selected = issues.in_state (state.name)
+        if selected:
+            end = ', "state": {}}}\n'.format (_dumps (state.name))
+            out.write ('{"title": ')
+            out.write ((end + '{"title": ').join ([_dumps (issue.title) for issue in selected]))
+            out.write (end)
+
+
+def write_markdown (fsm, issues, out):
+    # a section per state, its issues as list
+    out.write ('# Issues\n')
+
+    for state in fsm.workflow():
+        selected = issues.in_state (state.name)
+        out.write ('\n## {name}{is_start}{is_end} ({count})\n\n'.format (
+            name     = _escaped (str (state.name)),
+            is_start = ', start' if state.is_start else '',
+            is_end   = ', end' if state.is_end else '',
+            count    = len (selected),
+        ))
+
+        if selected:
+            # the separators hold no special characters, the titles of
+            # a state are escaped at once
+            out.write ('- ')
+            out.write (_escaped ('\n- '.join (_titles (selected))))
+            out.write ('\n')
+
+
+def _label (state):
+    return '{name} {is_start}{is_end}'.format (
+        name     = state.name,
+        is_start = ' (S)' if state.is_start else '',
+        is_end   = ' (E)' if state.is_end else '',
+    )
+
+
+_title = attrgetter ('title')
+
+
+def _titles (selected):
+    # OUT: titles of the given issues as strings
+    return list (map (str, map (_title, selected)))
+
+
+def _escaped (title):
+    # markdown special characters, so titles are shown as they are
+    for c in '\\`*_[]<>#|':
+        if c in title:
+            title = title.replace (c, '\\' + c)
+
+    return title
@@ -0,0 +1,343 @@
+""" service mode: files are loaded once and the FSM and issues served
+    as JSON over HTTP to any number of concurrent clients, eg.
+
+        python -m coffee --serve 8080 fsm.yml issues*.yml
+
+    GET /             what is loaded (files, counts, version)
+    GET /workflow     states in workflow order
+    GET /issues       issues grouped by state in workflow order
+                      (?state=<name>, ?limit=<n> issues per state)
+    GET /counts       number of issues per state
+    GET /reachable    states reachable from ?from=<name> (default:
+                      the start state)
+    GET /query        issues matching ?q=<clauses> (see coffee.query)
+
+    files are checked for changes every few seconds and reloaded in
+    the background, the old model is served until the new one is
+    complete (and kept if loading fails). asyncio and stdlib only
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from urllib.parse import urlsplit, parse_qs
+
+from coffee.coffee import FSM
+from coffee import cli
+
+
+class Model ():
+    """ FSM and issues as loaded from a set of files, never changed
+        once built, replaced as a whole on reload
+    """
+
+    def __init__ (self, **kwa):
+        self._fsm = kwa.get ('fsm')
+        self._issues = kwa.get ('issues')
+        self._filenames = kwa.get ('filenames') or []
+        self._version = kwa.get ('version') or 0
+        self._loaded = time.time()
+
+    def __repr__ (self):
+        return 'Model (version={version}, files={files})'.format (
+            version = self.version,
+            files   = self.filenames,
+        )
+
+    @property
+    def fsm (self):
+        return self._fsm
+
+    @property
+    def issues (self):
+        return self._issues
+
+    @property
+    def filenames (self):
+        return self._filenames
+
+    @property
+    def version (self):
+        return self._version
+
+    @property
+    def loaded (self):
+        return self._loaded
+
+
+def build (filenames, version = 0, order = None):
+    # IN:  files to load, as the CLI's `load` does, workflow order
+    # OUT: Model, raises RuntimeWarning for invalid data
+    transitions, add, remove, issues = cli.combine (filenames, cli.read_all (filenames))
+
+    if not transitions:
+        raise RuntimeWarning ('no transitions in <{}>'.format (', '.join (filenames)))
+
+    fsm = FSM (transitions = transitions, order = order)
+    if add or remove:
+        fsm.patch (add = add, remove = remove)
+
+    # computed once here, in the background, instead of by a request
+    fsm.workflow ()
+    fsm.validate ()
+
+    return Model (fsm = fsm, issues = issues, filenames = filenames, version = version)
+
+
+class Server ():
+
+    REASONS = { 200 : 'OK', 400 : 'Bad Request', 404 : 'Not Found', 405 : 'Method Not Allowed', 503 : 'Service Unavailable' }
+
+    def __init__ (self, **kwa):
+        # IN:  patterns (space separated filenames or glob patterns),
+        #      interval (seconds between checks for changed files),
+        #      order (workflow order, see FSM.ORDERS)
+        self._patterns = kwa.get ('patterns')
+        self._interval = kwa.get ('interval') or 2.0
+        self._order = kwa.get ('order')
+        self._model = None
+        self._signature = None
+        self._responses = {}    # (path, query) -> response body, per model
+
+    @property
+    def model (self):
+        return self._model
+
+    def signature (self):
+        # OUT: (filename, mtime, size) of all files matching the patterns
+        filenames = cli.expand (self._patterns) or []
+        result = []
+        for filename in filenames:
+            try:
+                st = os.stat (filename)
+            except OSError:
+                continue
+            result.append ((filename, st.st_mtime_ns, st.st_size))
+
+        return tuple (result)
+
+    async def reload (self):
+        """ (re)load the model if files were changed, added or removed
+            since the last load. the files are read in a worker thread,
+            requests are answered from the current model meanwhile.
+            returns True if a new model was loaded
+        """
+
+        signature = self.signature()
+        if signature == self._signature:
+            return False
+
+        filenames = [filename for filename, mtime, size in signature]
+        if not filenames:
+            raise RuntimeWarning ('no files matching <{}>'.format (self._patterns))
+
+        version = self._model.version + 1 if self._model else 1
+        model = await asyncio.get_running_loop().run_in_executor (None, build, filenames, version, self._order)
+
+        self._model, self._signature, self._responses = model, signature, {}
+        return True
+
+    async def watch (self):
+        # check for changed files every interval, forever. a failing
+        # reload keeps the current model
+        while True:
+            await asyncio.sleep (self._interval)
+            try:
+                if await self.reload():
+                    _log ('reloaded {} (version {})'.format (', '.join (self._model.filenames), self._model.version))
+            except Exception as e:
+                _log ('reload failed, serving version {}: {}'.format (self._model.version if self._model else '-', e))
+                self._signature = self.signature()
+
+    async def start (self, host = '127.0.0.1', port = 0):
+        # OUT: the listening asyncio server, after loading the model
+        await self.reload()
+        return await asyncio.start_server (self.handle, host, port)
+
+    async def handle (self, reader, writer):
+        # a connection: requests are answered one after another, as long
+        # as the client keeps the connection alive
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode ('latin-1').partition (':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int (headers.get ('content-length') or 0)
+                if length:
+                    await reader.readexactly (length)
+
+                parts = request.decode ('latin-1').split()
+                method, target, protocol = (parts + ['', '', ''])[:3]
+
+                status, body = self.respond (method, target)
+
+                keep_alive = (
+                    headers.get ('connection', '').lower() != 'close'
+                    and (protocol == 'HTTP/1.1' or headers.get ('connection', '').lower() == 'keep-alive')
+                )
+
+                writer.write ((
+                    'HTTP/1.1 {status} {reason}\r\n'
+                    'Content-Type: application/json\r\n'
+                    'Content-Length: {length}\r\n'
+                    'Connection: {connection}\r\n'
+                    '\r\n'
+                ).format (
+                    status     = status,
+                    reason     = self.REASONS.get (status, ''),
+                    length     = len (body),
+                    connection = 'keep-alive' if keep_alive else 'close',
+                ).encode ('latin-1') + body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    def respond (self, method, target):
+        """ return (status, JSON body) for the request. bodies of the
+            current model are cached, the model never changes (it is
+            replaced by reloading)
+        """
+
+        if method != 'GET':
+            return 405, _json ({ 'error' : 'only GET is supported' })
+        if not self._model:
+            return 503, _json ({ 'error' : 'nothing loaded' })
+
+        key = target
+        body = self._responses.get (key)
+        if body is not None:
+            return 200, body
+
+        url = urlsplit (target)
+        params = {name: values[-1] for name, values in parse_qs (url.query).items()}
+
+        handler = {
+            '/'          : self.status,
+            '/workflow'  : self.workflow,
+            '/issues'    : self.grouping,
+            '/counts'    : self.counts,
+            '/reachable' : self.reachable,
+            '/query'     : self.query,
+        }.get (url.path.rstrip ('/') or '/')
+
+        if not handler:
+            return 404, _json ({ 'error' : 'unknown path: {}'.format (url.path) })
+
+        try:
+            body = _json (handler (self._model, params))
+        except (LookupError, RuntimeWarning, ValueError) as e:
+            return 400, _json ({ 'error' : str (e).strip ('\'"') })
+
+        # keep the most recent responses only, queries are unbounded
+        if len (self._responses) >= 1024:
+            self._responses.clear()
+        self._responses[key] = body
+
+        return 200, body
+
+    def status (self, model, params):
+        return {
+            'files'   : model.filenames,
+            'version' : model.version,
+            'loaded'  : time.strftime ('%Y-%m-%dT%H:%M:%S%z', time.localtime (model.loaded)),
+            'states'  : len (model.fsm.states),
+            'issues'  : len (model.issues),
+        }
+
+    def workflow (self, model, params):
+        return [
+            {
+                'name'     : state.name,
+                'next'     : sorted (e.next_state.name for e in state.events),
+                'is_start' : state.is_start,
+                'is_end'   : state.is_end,
+            }
+            for state in model.fsm.workflow()
+        ]
+
+    def grouping (self, model, params):
+        limit = int (params['limit']) if 'limit' in params else None
+        states = [s.name for s in model.fsm.workflow()]
+        if 'state' in params:
+            states = [name for name in states if name == params['state']]
+
+        return [
+            {
+                'state'  : name,
+                'count'  : model.issues.count (name),
+                'issues' : [i.title for i in model.issues.in_state (name)[:limit]],
+            }
+            for name in states
+        ]
+
+    def counts (self, model, params):
+        return { s.name : model.issues.count (s.name) for s in model.fsm.workflow() }
+
+    def reachable (self, model, params):
+        return [s.name for s in model.fsm.reachable (params.get ('from'))]
+
+    def query (self, model, params):
+        from coffee import query
+
+        q = query.compile (params.get ('q'), model.fsm)
+        result = q.run (model.issues)
+        if q.count:
+            return result
+
+        return { name : [i.title for i in issues] for name, issues in result.items() }
+
+
+def _json (data):
+    return json.dumps (data).encode ('utf-8')
+
+
+def _log (message):
+    sys.stderr.write ('{}: {}\n'.format (time.strftime ('%H:%M:%S'), message))
+
+
+def serve (patterns, address, interval = None, order = None):
+    """ load the given files and serve them on the given address
+        ([host:]port) until interrupted
+    """
+
+    host, _, port = address.rpartition (':')
+
+    async def _main ():
+        server = Server (patterns = patterns, interval = interval, order = order)
+        listening = await server.start (host or '127.0.0.1', int (port))
+        watching = asyncio.ensure_future (server.watch())
+
+        for sock in listening.sockets:
+            _log ('serving {} on http://{}:{}/'.format (
+                ', '.join (server.model.filenames), *sock.getsockname()[:2]
+            ))
+
+        try:
+            async with listening:
+                await listening.serve_forever()
+        finally:
+            watching.cancel()
+
+    try:
+        asyncio.run (_main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,193 @@
+""" on-disk cache of parsed input files
+
+    snapshots are keyed by a hash of the input file's content, a
+    repeated load of an unchanged file skips parsing altogether.
+    the cache directory is $COFFEE_CACHE (default ~/.cache/coffee),
+    setting it to an empty string disables the cache.
+
+    binary layout (native byte order, recorded in the magic):
+
+        magic ........... 8 bytes, b'COFFEE2' + b'L' or b'B'
+        counts .......... 4 x uint64: strings, transitions, issues, blob size
+        string offsets .. (strings + 1) x uint64 into the blob
+        transitions ..... transitions x 3 x uint32 string ids (top-level
+                          key, from, to), eg. key 'transitions'
+        issues .......... issues x 2 x uint32 string ids (title, state),
+                          grouped by state
+                          (string id 0xffffffff stands for None)
+        blob ............ all distinct strings, utf-8 encoded
+
+    the file is memory mapped, the arrays are used in place
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+
+from coffee.coffee import Issue, Issues
+
+MAGIC = b'COFFEE2' + (b'L' if sys.byteorder == 'little' else b'B')
+COUNTS = struct.Struct ('=4Q')
+NONE = 0xffffffff
+
+
+def cache_dir ():
+    # OUT: cache directory, None if caching is disabled
+    path = os.environ.get ('COFFEE_CACHE', os.path.expanduser ('~/.cache/coffee'))
+
+    return path or None
+
+
+def digest (filename):
+    # OUT: hex digest of the file's content (and the snapshot format)
+    h = hashlib.blake2b (MAGIC, digest_size = 20)
+    with open (filename, 'rb') as f:
+        for chunk in iter (lambda: f.read (1 << 20), b''):
+            h.update (chunk)
+
+    return h.hexdigest()
+
+
+def snapshot_path (filename):
+    # OUT: path of the snapshot for the given input file, None if disabled
+    directory = cache_dir()
+    if not directory:
+        return None
+
+    return os.path.join (directory, '{}.snap'.format (digest (filename)))
+
+
+def load (filename):
+    """ return (transitions, issues) as stored for the given input
+        file, None if there is no (usable) snapshot. transitions are
+        a dict of top-level key -> list of dicts
+    """
+
+    path = snapshot_path (filename)
+    if not path or not os.path.isfile (path):
+        return None
+
+    try:
+        with open (path, 'rb') as f:
+            with mmap.mmap (f.fileno(), 0, access = mmap.ACCESS_READ) as m:
+                with memoryview (m) as view:
+                    return _read (view)
+    except (OSError, ValueError, TypeError, IndexError, KeyError, struct.error, UnicodeDecodeError):
+        # broken or foreign snapshots are just a cache miss, eg. string
+        # ids out of range (KeyError)
+        return None
+
+
+def save (filename, transitions, issues):
+    """ store parsed transitions (dict of top-level key -> list of
+        dicts) and issues (Issues) for the given input file. failing to write is not an error,
+        the snapshot is just missing then
+    """
+
+    path = snapshot_path (filename)
+    if not path:
+        return None
+
+    try:
+        os.makedirs (os.path.dirname (path), exist_ok = True)
+
+        # write to a temporary file first, concurrent loads must
+        # never see a partial snapshot
+        import tempfile
+
+        fd, tmp = tempfile.mkstemp (dir = os.path.dirname (path), suffix = '.tmp')
+        with os.fdopen (fd, 'wb') as f:
+            _write (f, transitions, issues)
+        os.replace (tmp, path)
+
+    except OSError:
+        return None
+
+    return path
+
+
+def _write (f, transitions, issues):
+    ids = {}
+
+    def _id (value):
+        if value is None:
+            return NONE
+        # snapshots store strings only, as does the streaming parser
+        return ids.setdefault (str (value), len (ids))
+
+    trans = array ('I')
+    for key, records in transitions.items():
+        for t in records:
+            trans.extend ((_id (key), _id (t.get ('from')), _id (t.get ('to'))))
+
+    iss = array ('I')
+    for issue in issues:
+        iss.extend ((_id (issue.title), _id (issue.state)))
+
+    encoded = [s.encode() for s in ids]
+    offsets = array ('Q', [0])
+    for s in encoded:
+        offsets.append (offsets[-1] + len (s))
+
+    f.write (MAGIC)
+    f.write (COUNTS.pack (len (encoded), len (trans) // 3, len (iss) // 2, offsets[-1]))
+    f.write (offsets.tobytes())
+    f.write (trans.tobytes())
+    f.write (iss.tobytes())
+    f.write (b''.join (encoded))
+
+
+def _read (view):
+    if bytes (view[:len (MAGIC)]) != MAGIC:
+        raise ValueError ('not a snapshot')
+
+    pos = len (MAGIC)
+    n_strings, n_trans, n_issues, blob_size = COUNTS.unpack_from (view, pos)
+    pos += COUNTS.size
+
+    # views into the mapped file, these must be released before the
+    # mmap can be closed
+    parts = []
+
+    def _take (fmt, count):
+        nonlocal pos
+        size = count * struct.calcsize (fmt)
+        parts.append (view[pos:pos + size])
+        if len (parts[-1]) != size:
+            raise ValueError ('truncated snapshot')
+        parts.append (parts[-1].cast (fmt))
+        pos += size
+        return parts[-1]
+
+    try:
+        offsets = _take ('Q', n_strings + 1)
+        trans = _take ('I', 3 * n_trans)
+        iss = _take ('I', 2 * n_issues)
+        blob = _take ('B', blob_size)
+
+        # one string object per distinct string, shared by all issues
+        strings = {
+            i : str (blob[offsets[i]:offsets[i + 1]], 'utf-8')
+            for i in range (n_strings)
+        }
+        strings[NONE] = None
+
+        transitions = {}
+        for i in range (0, len (trans), 3):
+            transitions.setdefault (strings[trans[i]], []).append (
+                { 'from' : strings[trans[i + 1]], 'to' : strings[trans[i + 2]] }
+            )
+
+        issues = Issues()
+        for i in range (0, len (iss), 2):
+            issues.add (Issue (title = strings[iss[i]], state = strings[iss[i + 1]]))
+
+        return transitions, issues
+
+    finally:
+        for part in reversed (parts):
+            part.release()
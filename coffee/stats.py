@@ -0,0 +1,176 @@
+""" opt-in instrumentation: time spent (and memory allocated) per
+    phase, eg. parsing, building the FSM or printing, and counters of
+    objects processed.
+
+    switched off by default, phases then cost a single check. switch
+    it on with the environment variable COFFEE_STATS (any non-empty
+    value, 'memory' also traces memory allocations, which is slow)
+    or `python -m coffee --stats`
+"""
+
+import os
+import time
+
+# phase-name -> [calls, seconds, peak bytes allocated (or None)],
+# counter-name -> number, both in order of first use
+_phases = {}
+_counters = {}
+
+# running phases, innermost last: [name, started, bytes at start, peak bytes]
+_running = []
+
+_enabled = False
+_memory = False
+
+
+class _Off ():
+    # context manager doing nothing, shared by all phases while switched off
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *exc):
+        return False
+
+_OFF = _Off()
+
+
+class _Phase ():
+
+    __slots__ = ('_name',)
+
+    def __init__ (self, name):
+        self._name = name
+
+    def __enter__ (self):
+        allocated = 0
+        if _memory:
+            import tracemalloc
+
+            allocated, peak = tracemalloc.get_traced_memory()
+            # the peak is reset for this phase, keep the enclosing one's
+            if _running:
+                _running[-1][3] = max (_running[-1][3], peak)
+            tracemalloc.reset_peak()
+
+        _running.append ([self._name, time.perf_counter(), allocated, allocated])
+        return self
+
+    def __exit__ (self, *exc):
+        name, started, allocated, peak = _running.pop()
+        seconds = time.perf_counter() - started
+
+        record = _phases.setdefault (name, [0, 0.0, None])
+        record[0] += 1
+        record[1] += seconds
+
+        if _memory:
+            import tracemalloc
+
+            peak = max (peak, tracemalloc.get_traced_memory()[1])
+            record[2] = max (record[2] or 0, peak - allocated)
+            if _running:
+                _running[-1][3] = max (_running[-1][3], peak)
+
+        return False
+
+
+def enable (memory = False):
+    # IN:  True to trace memory allocations too
+    global _enabled, _memory
+
+    _enabled = True
+    if memory and not _memory:
+        import tracemalloc
+
+        tracemalloc.start()
+        _memory = True
+
+
+def disable ():
+    global _enabled, _memory
+
+    if _memory:
+        import tracemalloc
+
+        tracemalloc.stop()
+
+    _enabled = _memory = False
+
+
+def enabled ():
+    return _enabled
+
+
+def reset ():
+    _phases.clear()
+    _counters.clear()
+
+
+def phase (name):
+    # OUT: context manager recording the time spent in the named phase
+    return _Phase (name) if _enabled else _OFF
+
+
+def count (name, n = 1):
+    # add n to the named counter
+    if _enabled:
+        _counters[name] = _counters.get (name, 0) + n
+
+
+def phases ():
+    # OUT: dict phase-name -> (calls, seconds, peak bytes or None)
+    return {name: tuple (record) for name, record in _phases.items()}
+
+
+def counters ():
+    # OUT: dict counter-name -> number
+    return dict (_counters)
+
+
+def peak_rss ():
+    # OUT: peak resident set size of this process (bytes), None if unknown
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    import sys
+
+    rss = resource.getrusage (resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes, but bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def report ():
+    # OUT: lines describing the recorded phases and counters
+    lines = ['  {:<30} {:>8} {:>12} {:>12}'.format ('phase', 'calls', 'seconds', 'peak memory')]
+    for name, (calls, seconds, peak) in _phases.items():
+        lines.append ('  {name:<30} {calls:>8} {seconds:11.4f}s {peak:>12}'.format (
+            name    = name,
+            calls   = calls,
+            seconds = seconds,
+            peak    = _size (peak) if peak is not None else '-',
+        ))
+
+    if _counters:
+        lines.append ('')
+        lines.extend (
+            '  {name:<30} {n:>8}'.format (name = name, n = n)
+            for name, n in _counters.items()
+        )
+
+    rss = peak_rss()
+    if rss:
+        lines.append ('')
+        lines.append ('  {:<30} {:>21}'.format ('peak RSS', _size (rss)))
+
+    return lines
+
+
+def _size (n):
+    return '{:.1f} MiB'.format (n / 2 ** 20)
+
+
+if os.environ.get ('COFFEE_STATS'):
+    enable (memory = os.environ['COFFEE_STATS'] == 'memory')
@@ -0,0 +1,111 @@
+import unittest
+import random
+
+from coffee.coffee import FSM
+from coffee import analytics
+
+TRANSITIONS = [
+    { 'from' : 'to do',   'to' : 'doing' },
+    { 'from' : 'to do',   'to' : 'on hold' },
+    { 'from' : 'doing',   'to' : 'done' },
+    { 'from' : 'doing',   'to' : 'failed' },
+    { 'from' : 'doing',   'to' : 'on hold' },
+    { 'from' : 'on hold', 'to' : 'doing' },
+]
+
+def names (states):
+    return [s.name for s in states] if states is not None else None
+
+class Test_Analytics (unittest.TestCase):
+
+    def test_paths (self):
+        fsm = FSM (transitions = TRANSITIONS)
+
+        self.assertEqual (['to do', 'doing', 'done'], names (analytics.shortest_path (fsm, 'to do', 'done')))
+        self.assertEqual (['on hold', 'doing', 'failed'], names (analytics.shortest_path (fsm, 'on hold', 'failed')))
+        self.assertEqual (['done'], names (analytics.shortest_path (fsm, 'done', 'done')))
+        self.assertIsNone (analytics.shortest_path (fsm, 'done', 'to do'))
+        self.assertEqual (
+            { 'on hold' : 0, 'doing' : 1, 'done' : 2, 'failed' : 2 },
+            analytics.distances (fsm, 'on hold'),
+        )
+
+        with self.assertRaises (LookupError):
+            analytics.shortest_path (fsm, 'to do', 'nowhere')
+
+    def test_components (self):
+        fsm = FSM (transitions = TRANSITIONS + [{ 'from' : 'failed', 'to' : 'failed' }])
+
+        components = [sorted (names (c)) for c in analytics.components (fsm)]
+        self.assertEqual (5, sum (len (c) for c in components))
+        # components come before those they are reachable from
+        self.assertLess (components.index (['doing', 'on hold']), components.index (['to do']))
+        self.assertLess (components.index (['done']), components.index (['doing', 'on hold']))
+
+        self.assertEqual ([['doing', 'on hold'], ['failed']], sorted (names (c) for c in analytics.loops (fsm)))
+
+    def test_long_chain (self):
+        # no recursion, no matter how long the workflow
+        fsm = FSM (transitions = [{ 'from' : 'S{}'.format (i), 'to' : 'S{}'.format (i + 1) } for i in range (20000)])
+
+        self.assertEqual (20001, len (analytics.components (fsm)))
+        self.assertTrue (analytics.reaches (fsm, 'S0', 'S20000'))
+        self.assertFalse (analytics.reaches (fsm, 'S20000', 'S0'))
+        self.assertEqual (20001, len (analytics.shortest_path (fsm, 'S0', 'S20000')))
+
+    def test_closure (self):
+        # reaches() agrees with a search from every state
+        rng = random.Random (4711)
+        transitions = [{ 'from' : 'S', 'to' : 'N{}'.format (i) } for i in range (40)] + [
+            { 'from' : 'N{}'.format (rng.randrange (40)), 'to' : 'N{}'.format (rng.randrange (40)) }
+            for _ in range (80)
+        ] + [{ 'from' : 'N{}'.format (i), 'to' : 'E' } for i in range (40)]
+
+        fsm = FSM (transitions = transitions)
+        for frm in fsm.states:
+            reachable = set (names (fsm.reachable (frm.name)))
+            for to in fsm.states:
+                self.assertEqual (to.name in reachable, analytics.reaches (fsm, frm.name, to.name))
+
+    def test_cache (self):
+        fsm = FSM (transitions = TRANSITIONS)
+
+        analysis = analytics.analysis (fsm)
+        self.assertIs (analysis, analytics.analysis (fsm))
+        self.assertFalse (analytics.reaches (fsm, 'done', 'to do'))
+
+        fsm.add_transition ('done', 'to do')
+        self.assertIsNot (analysis, analytics.analysis (fsm))
+        self.assertTrue (analytics.reaches (fsm, 'done', 'to do'))
+        self.assertEqual (['done', 'to do', 'on hold'], names (analytics.shortest_path (fsm, 'done', 'on hold')))
+
+    def test_workflow_order (self):
+        fsm = FSM (transitions = TRANSITIONS, order = 'topological')
+
+        # the loop doing <-> on hold is kept together, before the states
+        # it leads to
+        self.assertEqual (['to do', 'doing', 'on hold', 'done', 'failed'], names (fsm.workflow()))
+
+        fsm.order = 'depth'
+        self.assertEqual (['to do', 'doing', 'done', 'failed', 'on hold'], names (fsm.workflow()))
+
+        # a state entered from the loop and from before it comes last
+        fsm = FSM (transitions = TRANSITIONS + [{ 'from' : 'to do', 'to' : 'canceled' }, { 'from' : 'on hold', 'to' : 'canceled' }], order = 'topological')
+        self.assertEqual (['to do', 'doing', 'on hold', 'canceled', 'done', 'failed'], names (fsm.workflow()))
+
+        with self.assertRaises (RuntimeWarning):
+            fsm.order = 'random'
+
+    def test_workflow_order_long (self):
+        # 10000 loops of two states in a row, in linear time and no recursion
+        transitions = []
+        for i in range (10000):
+            transitions.append ({ 'from' : 'A{}'.format (i), 'to' : 'B{}'.format (i) })
+            transitions.append ({ 'from' : 'B{}'.format (i), 'to' : 'A{}'.format (i) })
+            transitions.append ({ 'from' : 'B{}'.format (i), 'to' : 'A{}'.format (i + 1) })
+
+        fsm = FSM (transitions = [{ 'from' : 'S', 'to' : 'A0' }] + transitions, order = 'topological')
+        workflow = names (fsm.workflow())
+
+        self.assertEqual (['S', 'A0', 'B0', 'A1', 'B1'], workflow[:5])
+        self.assertEqual (['B9999', 'A10000'], workflow[-2:])
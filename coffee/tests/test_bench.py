@@ -0,0 +1,38 @@
+import unittest
+import contextlib
+import io
+
+from coffee.coffee import FSM
+from coffee.bench import SHAPES, issue_sizes, compare, run
+
+class Test_Bench (unittest.TestCase):
+
+    def test_shapes (self):
+        # every generated FSM is valid and workflows cover all states
+        for name, transitions in SHAPES.items():
+            fsm = FSM (transitions = transitions (100))
+
+            self.assertIsNone (fsm.validate().error, name)
+            self.assertEqual (len (fsm.states), len (fsm.workflow()), name)
+
+            fsm.order = 'topological'
+            self.assertEqual (len (fsm.states), len (fsm.workflow()), name)
+
+        cyclic = FSM (transitions = SHAPES['cyclic'] (100))
+        self.assertTrue (cyclic.has_transition ('S1', 'S2'))
+        self.assertTrue (cyclic.has_transition ('S2', 'S1'))
+
+    def test_issue_sizes (self):
+        self.assertEqual ([1000, 10000, 100000], issue_sizes (1e5))
+        self.assertEqual ([1000], issue_sizes (5000))
+
+    def test_run (self):
+        with contextlib.redirect_stdout (io.StringIO()) as out:
+            results = run ([100], [1000], validated = 1000)
+            ok = compare (results, { 'results' : { name : [(n, 2 * value) for n, value in r] for name, r in results.items() } })
+
+        self.assertTrue (ok)
+        self.assertEqual ([1000], [n for n, seconds in results['Load (YAML, snapshot)']])
+        self.assertIn ('FSM workflow (cyclic)', results)
+        self.assertEqual ([1000], [n for n, seconds in results['FSM validate (chain, adjacency built)']])
+        self.assertIn ('0.50x', out.getvalue())
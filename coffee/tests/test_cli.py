@@ -1,8 +1,291 @@
 import unittest
+import unittest.mock
+import contextlib
+import tempfile
+import io
+import os
 
-from coffee.cli import CLI
+from coffee.cli import CLI, main
+from coffee import stats
+from coffee.bench import imported_modules, LAZY_MODULES
+
+DATA = os.path.join (os.path.dirname (__file__), '..', '..')
+
+def data (filename):
+    return os.path.join (DATA, filename)
 
 class Test_CLI (unittest.TestCase):
 
+    def setUp (self):
+        # keep snapshots of the test runs out of the user's cache
+        cache = tempfile.TemporaryDirectory()
+        self.addCleanup (cache.cleanup)
+
+        env = unittest.mock.patch.dict (os.environ, { 'COFFEE_CACHE' : cache.name })
+        env.start()
+        self.addCleanup (env.stop)
+
     def test_smoke (self):
         CLI()
+
+    def test_batch_01 (self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            ok = CLI().batch ([
+                'load {}'.format (data ('fsm.yml')),
+                'load {}'.format (data ('issues1.yml')),
+                'print',
+            ])
+
+        self.assertTrue (ok)
+        self.assertIn ('  (*) to do  (S)\n    (-) Fill water tank\n', out.getvalue())
+
+    def test_batch_02 (self):
+        # failing commands don't stop the batch, but are reported
+        cli = CLI()
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            ok = cli.batch (['bogus', 'print', 'load {}'.format (data ('fsm.yml'))])
+
+        self.assertFalse (ok)
+        self.assertEqual ([data ('fsm.yml')], cli.loaded_from)
+        self.assertIn ('ERROR: invalid command', out.getvalue())
+        self.assertIn ('ERROR: Please load FSM', out.getvalue())
+
+    def test_main_01 (self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            status = main (['-c', 'print fsm', data ('fsm.yml')])
+
+        self.assertEqual (0, status)
+        self.assertIn ('  (*) on hold (-> doing)\n', out.getvalue())
+
+    def test_main_02 (self):
+        with contextlib.redirect_stdout (io.StringIO()):
+            status = main (['-c', 'print', data ('fsm.yml')])
+
+        # no issues loaded
+        self.assertEqual (1, status)
+
+    def test_main_03 (self):
+        # --stats is a flag, files follow it
+        self.addCleanup (stats.reset)
+        self.addCleanup (stats.disable)
+
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout (out), contextlib.redirect_stderr (err):
+            status = main (['--stats', data ('fsm.yml'), data ('issues1.yml')])
+
+        self.assertEqual (0, status)
+        self.assertIn ('    (-) Make coffee\n', out.getvalue())
+        self.assertRegex (err.getvalue(), r'\n  fsm build +1 ')
+
+    def test_lazy_imports_01 (self):
+        # heavy modules are only imported by the commands needing them
+        loaded = imported_modules ('import coffee.cli')
+
+        self.assertEqual ([], [name for name in LAZY_MODULES if name in loaded])
+
+    def test_lazy_imports_02 (self):
+        loaded = imported_modules ('\n'.join ([
+            'import contextlib, io',
+            'from coffee.cli import main',
+            'with contextlib.redirect_stdout (io.StringIO()):',
+            '    main ([{!r}])'.format (data ('combined.yml')),
+        ]))
+
+        self.assertIn ('yaml', loaded)
+        self.assertNotIn ('prompt_toolkit', loaded)
+        self.assertNotIn ('graphviz', loaded)
+
+    def test_snapshot_01 (self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            main ([data ('combined.yml')])
+            main ([data ('combined.yml')])
+
+        self.assertEqual (1, out.getvalue().count ('(snapshot)'))
+        self.assertEqual (2, out.getvalue().count ('    (-) Fill water tank\n'))
+
+    def test_load_01 (self):
+        # several files (and globs) are merged into one grouping
+        cli = CLI()
+        with contextlib.redirect_stdout (io.StringIO()):
+            ok = cli.batch (['load {} {}'.format (data ('fsm.yml'), data ('issues?.yml'))])
+
+        self.assertTrue (ok)
+        self.assertEqual (3, len (cli.loaded_from))
+        self.assertEqual (14, len (cli.issues))
+        self.assertEqual (5, cli.issues.count ('done'))
+
+    def test_load_02 (self):
+        # the same transitions in several files are fine, different ones are not
+        cli = CLI()
+        with contextlib.redirect_stdout (io.StringIO()):
+            self.assertTrue (cli.batch (['load {} {}'.format (data ('fsm.yml'), data ('combined.yml'))]))
+            self.assertFalse (cli.batch (['load {} {}'.format (data ('fsm.yml'), data ('fsm01.yml'))]))
+
+    def test_load_03 (self):
+        cli = CLI()
+        with contextlib.redirect_stdout (io.StringIO()):
+            self.assertFalse (cli.batch (['load {} {}'.format (data ('fsm.yml'), data ('nothing*.yml'))]))
+
+        self.assertEqual ([], cli.loaded_from)
+
+    def test_load_04 (self):
+        # changes to transitions are applied to the loaded FSM
+        changes = os.path.join (os.environ['COFFEE_CACHE'], 'changes.yml')
+        with open (changes, 'w') as f:
+            f.write ('add_transitions:\n    - { from: done, to: archived }\n')
+
+        cli = CLI()
+        with contextlib.redirect_stdout (io.StringIO()):
+            self.assertFalse (cli.batch (['load {}'.format (changes)]))
+            self.assertTrue (cli.batch (['load {}'.format (data ('fsm.yml')), 'load {}'.format (changes)]))
+
+        self.assertTrue (cli.fsm.fetch_state ('archived').is_end)
+        self.assertFalse (cli.fsm.fetch_state ('done').is_end)
+
+    def test_move_01 (self):
+        moves = os.path.join (os.environ['COFFEE_CACHE'], 'moves.jsonl')
+        with open (moves, 'w') as f:
+            f.write ('{"title": "Make coffee", "from": "on hold", "to": "doing"}\n')
+            f.write ('{"title": "Make coffee", "from": "doing", "to": "done"}\n')
+
+        cli = CLI()
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            self.assertFalse (cli.batch (['move {}'.format (moves)]))
+            self.assertTrue (cli.batch ([
+                'load {} {}'.format (data ('fsm.yml'), data ('issues1.yml')),
+                'move {}'.format (moves),
+            ]))
+
+        self.assertIn ('INFO: applied 2 moves', out.getvalue())
+        self.assertEqual (2, cli.issues.count ('done'))
+        self.assertEqual (0, cli.issues.count ('on hold'))
+
+    def test_print_01 (self):
+        cli = CLI()
+        with contextlib.redirect_stdout (io.StringIO()):
+            self.assertTrue (cli.batch (['load {} {}'.format (data ('fsm.yml'), data ('issues1.yml'))]))
+
+        summary, page = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout (summary):
+            self.assertTrue (cli.batch (['print summary 1']))
+        with contextlib.redirect_stdout (page):
+            self.assertTrue (cli.batch (['print 1 2']))
+
+        summary, page = summary.getvalue(), page.getvalue()
+
+        self.assertIn (
+            '  (*) to do  (S)          2   28.6%\n'
+            '    (-) Fill water tank\n'
+            '    (+) 1 more\n'
+            '  (*) doing               1   14.3%\n',
+            summary,
+        )
+        self.assertIn ('  7 issues, 0 not in the workflow', summary)
+        self.assertIn ('  (*) to do  (S)\n    (-) Make more coffee\n  (*) doing \n', page)
+        self.assertNotIn ('Fill water tank', page)
+
+    def test_stats_01 (self):
+        self.addCleanup (stats.reset)
+        self.addCleanup (stats.disable)
+
+        cli = CLI()
+        out = io.StringIO()
+        # profiles go to a temporary file, keep it with the test's snapshots
+        with contextlib.redirect_stdout (out), unittest.mock.patch ('tempfile.tempdir', os.environ['COFFEE_CACHE']):
+            self.assertTrue (cli.batch ([
+                'stats on',
+                'load {} {}'.format (data ('fsm.yml'), data ('issues1.yml')),
+                'profile print',
+                'stats',
+            ]))
+            self.assertFalse (cli.batch (['profile bogus']))
+
+        self.assertRegex (out.getvalue(), r'INFO: profile of <print> written to \S+\.pstats')
+        self.assertRegex (out.getvalue(), r'\n  fsm build +1 ')
+        self.assertRegex (out.getvalue(), r'\n  issues read +7\n')
+        self.assertIn ('states: 5, issues: 7, moves: 0', out.getvalue())
+        self.assertEqual (4, cli.lives)
+
+    def test_query_01 (self):
+        cli = CLI()
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            self.assertTrue (cli.batch ([
+                'load {} {}'.format (data ('fsm.yml'), data ('issues1.yml')),
+                'query reachable "on hold" title \'coff?ee machine$\'',
+                'query title (?i)COFFEE count',
+            ]))
+            self.assertFalse (cli.batch (['query title [']))
+
+        self.assertIn (
+            '  (*) done\n'
+            '    (-) Get new coffee machine\n'
+            '  (*) failed\n'
+            '    (-) Repair old coffee machine\n'
+            '\n'
+            '  2 issues in 2 states\n',
+            out.getvalue(),
+        )
+        self.assertIn ('  (*) to do           1\n', out.getvalue())
+        self.assertIn ('  5 issues in 4 states\n', out.getvalue())
+
+    def test_analytics_01 (self):
+        cli = CLI()
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            self.assertTrue (cli.batch ([
+                'load {} {}'.format (data ('fsm.yml'), data ('issues1.yml')),
+                'path "to do" failed',
+                'path done "to do"',
+                'loops',
+            ]))
+            self.assertFalse (cli.batch (['path "to do"']))
+
+        self.assertIn ('  to do -> doing -> failed (2 transitions)\n', out.getvalue())
+        self.assertIn ('  <to do> can not be reached from <done>\n', out.getvalue())
+        self.assertIn ('  (@) doing, on hold\n    (-) (Re)fill beans\n    (-) Make coffee\n', out.getvalue())
+
+    def test_order_01 (self):
+        cli = CLI (order = 'topological')
+        out = io.StringIO()
+        with contextlib.redirect_stdout (out):
+            self.assertTrue (cli.batch ([
+                'load {}'.format (data ('fsm.yml')),
+                'print fsm',
+                'order depth',
+                'print fsm',
+                'order',
+            ]))
+            self.assertFalse (cli.batch (['order random']))
+
+        drawn = [line.split()[1] for line in out.getvalue().splitlines() if line.startswith ('  (*)')]
+        self.assertEqual (['to', 'doing', 'on', 'done', 'failed', 'to', 'doing', 'done', 'failed', 'on'], drawn)
+        self.assertIn ('  workflow order: depth\n', out.getvalue())
+        self.assertEqual ('depth', cli.fsm.order)
+
+    def test_export_01 (self):
+        with tempfile.TemporaryDirectory() as directory:
+            exported = os.path.join (directory, 'issues.jsonl')
+
+            out = io.StringIO()
+            with contextlib.redirect_stdout (out):
+                self.assertTrue (CLI().batch ([
+                    'load {} {}'.format (data ('fsm.yml'), data ('issues1.yml')),
+                    'export csv',
+                    'export jsonl {}'.format (exported),
+                ]))
+                self.assertFalse (CLI().batch (['export xml']))
+
+            self.assertIn ('state,title\nto do,Fill water tank\n', out.getvalue())
+            self.assertIn ('INFO: exported 7 issues (jsonl) to {}'.format (exported), out.getvalue())
+
+            # exported issues load again
+            cli = CLI()
+            with contextlib.redirect_stdout (io.StringIO()):
+                self.assertTrue (cli.batch (['load {} {}'.format (data ('fsm.yml'), exported)]))
+            self.assertEqual (7, len (cli.issues))
@@ -1,8 +1,11 @@
 import unittest
 import json
+import random
+import pickle
 import yaml
 
-from coffee.coffee import FSM, State
+from coffee.coffee import FSM, State, Event, Issue, Issues
+from coffee import stats
 
 class Test_Coffee (unittest.TestCase):
 
@@ -109,3 +112,431 @@ class Test_Coffee (unittest.TestCase):
         self.assertEqual (2, len (fsm.states))
         self.assertEqual ('A', [s for s in fsm.states if s.is_start].pop().name)
         self.assertEqual ('B', [s for s in fsm.states if s.is_end].pop().name)
+
+    def test_state_index_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'A', 'to' : 'B' },
+            { 'from' : 'B', 'to' : 'C' },
+        ])
+
+        self.assertTrue (fsm.known_state ('B'))
+        self.assertFalse (fsm.known_state ('X'))
+        self.assertIs (fsm.fetch_state ('B'), [s for s in fsm.states if s.name == 'B'].pop())
+
+        with self.assertRaises (LookupError):
+            fsm.fetch_state ('X')
+
+        with self.assertRaises (LookupError):
+            fsm.add_state (State (name = 'A'))
+
+    def test_state_index_02 (self):
+        # replacing states keeps the index in sync
+        fsm = FSM (transitions = [
+            { 'from' : 'A', 'to' : 'B' },
+        ])
+        fsm.states = [State (name = 'X')]
+
+        self.assertTrue (fsm.known_state ('X'))
+        self.assertFalse (fsm.known_state ('A'))
+
+    def test_state_index_03 (self):
+        # a self-referencing transition must not duplicate its state
+        fsm = FSM (transitions = [
+            { 'from' : 'A', 'to' : 'B' },
+            { 'from' : 'B', 'to' : 'B' },
+            { 'from' : 'B', 'to' : 'C' },
+        ])
+
+        self.assertEqual (3, len (fsm.states))
+        self.assertIs (fsm.fetch_state ('B'), fsm.fetch_state ('B').events[0].next_state)
+
+    def test_state_ordering_07 (self):
+        # long chains must not hit the recursion limit
+        n = 5000
+        fsm = FSM (transitions = [
+            { 'from' : 'S{}'.format (i), 'to' : 'S{}'.format (i + 1) }
+            for i in range (n)
+        ])
+
+        self.assertEqual (
+            [state.name for state in fsm.workflow()],
+            ['S{}'.format (i) for i in range (n + 1)],
+        )
+
+    def test_state_ordering_08 (self):
+        # repeated calls must not share visited states
+        fsm = FSM (transitions = [
+            { 'from' : 'to do', 'to' : 'doing' },
+            { 'from' : 'doing', 'to' : 'done' },
+        ])
+
+        self.assertEqual (fsm.workflow(), fsm.workflow())
+        self.assertEqual (3, len (fsm.workflow()))
+
+    def test_state_ordering_09 (self):
+        # depth-first, alphabetically for alternative paths
+        fsm = FSM (transitions = [
+            { 'from' : 'S', 'to' : 'B' },
+            { 'from' : 'S', 'to' : 'A' },
+            { 'from' : 'A', 'to' : 'C' },
+            { 'from' : 'C', 'to' : 'B' },
+            { 'from' : 'B', 'to' : 'D' },
+            { 'from' : 'C', 'to' : 'E' },
+        ])
+
+        self.assertEqual (
+            [state.name for state in fsm.workflow()],
+            ['S', 'A', 'C', 'B', 'D', 'E'],
+        )
+
+    def test_workflow_cache_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'A', 'to' : 'B' },
+        ])
+        version = fsm.version
+        workflow = fsm.workflow()
+
+        # cached results are copies, unchanged FSMs keep their version
+        workflow.pop()
+        self.assertEqual (['A', 'B'], [s.name for s in fsm.workflow()])
+        self.assertEqual (version, fsm.version)
+
+    def test_workflow_cache_02 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'A', 'to' : 'B' },
+        ])
+        self.assertEqual (['A', 'B'], [s.name for s in fsm.workflow()])
+
+        b = fsm.fetch_state ('B')
+        c = State (name = 'C')
+        fsm.add_state (c)
+        b.add_event (Event (next_state = c))
+        fsm.invalidate ()
+
+        # start/end flags are derived from the events again
+        self.assertEqual (['A', 'B', 'C'], [s.name for s in fsm.workflow()])
+        self.assertEqual ([True, False, False], [s.is_start for s in fsm.workflow()])
+        self.assertEqual ([False, False, True], [s.is_end for s in fsm.workflow()])
+
+        # loop back into the start state
+        c.add_event (Event (next_state = fsm.fetch_state ('A')))
+        fsm.invalidate ()
+
+        with self.assertRaises (RuntimeWarning):
+            fsm.workflow()
+
+    def test_issues_01 (self):
+        issues = Issues (issues = [
+            { 'title' : 'Fill water tank',   'state' : 'to do' },
+            { 'title' : 'Make coffee',       'state' : 'doing' },
+            { 'title' : 'Make more coffee',  'state' : 'to do' },
+            { 'title' : 'Drink coffee',      'state' : 'drinking' },
+        ])
+
+        self.assertEqual (4, len (issues))
+        self.assertEqual (
+            ['Fill water tank', 'Make more coffee'],
+            [i.title for i in issues.in_state ('to do')],
+        )
+        self.assertEqual ([], issues.in_state ('done'))
+        self.assertEqual (0, issues.count ('done'))
+        self.assertEqual ({ 'to do' : 2, 'doing' : 1, 'drinking' : 1 }, issues.counts())
+
+        fsm = FSM (transitions = [
+            { 'from' : 'to do', 'to' : 'doing' },
+            { 'from' : 'doing', 'to' : 'done' },
+        ])
+        self.assertEqual ({'drinking'}, issues.orphaned_states (fsm))
+
+    def test_issues_02 (self):
+        issues = Issues()
+
+        self.assertFalse (issues)
+        self.assertEqual (set(), issues.states())
+
+    def test_slots_01 (self):
+        # compact objects, but the attribute API is unchanged
+        issue = Issue (title = 'Make coffee', state = 'doing')
+        issue.state = 'done'
+
+        self.assertEqual ('done', issue.state)
+        self.assertFalse (hasattr (issue, '__dict__'))
+
+        with self.assertRaises (AttributeError):
+            issue.priority = 'high'
+
+    def test_adjacency_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'to do', 'to' : 'on hold' },
+            { 'from' : 'to do', 'to' : 'doing' },
+            { 'from' : 'doing', 'to' : 'done' },
+        ])
+        offsets, targets, indegree = fsm._adjacency()
+        ids = { name : fsm.state_id (name) for name in ('to do', 'doing', 'on hold', 'done') }
+
+        todo = ids['to do']
+        self.assertEqual (
+            [ids['doing'], ids['on hold']],
+            list (targets[offsets[todo]:offsets[todo + 1]]),
+        )
+        self.assertEqual (0, indegree[todo])
+        self.assertEqual (1, indegree[ids['done']])
+        self.assertIs (fsm.states[ids['done']], fsm.fetch_state ('done'))
+
+    def test_validate_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'to do',   'to' : 'doing' },
+            { 'from' : 'doing',   'to' : 'done' },
+            { 'from' : 'doing',   'to' : 'on hold' },
+            { 'from' : 'on hold', 'to' : 'doing' },
+        ])
+        report = fsm.validate()
+
+        self.assertEqual (['to do'], [s.name for s in report.start_states])
+        self.assertEqual (['done'], [s.name for s in report.end_states])
+        self.assertEqual ([], report.unreachable)
+        self.assertEqual ([], report.dead_ends)
+        self.assertIsNone (report.error)
+        self.assertIs (report, fsm.validate())
+
+    def test_validate_02 (self):
+        # 'limbo' can neither be reached nor be left towards an end state
+        fsm = FSM (transitions = [
+            { 'from' : 'to do',   'to' : 'doing' },
+            { 'from' : 'doing',   'to' : 'done' },
+            { 'from' : 'doing',   'to' : 'trap' },
+            { 'from' : 'trap',    'to' : 'trap' },
+            { 'from' : 'limbo',   'to' : 'purgatory' },
+            { 'from' : 'purgatory', 'to' : 'limbo' },
+        ])
+        report = fsm.validate()
+
+        self.assertEqual (['to do'], [s.name for s in report.start_states])
+        self.assertEqual (['done'], [s.name for s in report.end_states])
+        self.assertEqual (['limbo', 'purgatory'], sorted (s.name for s in report.unreachable))
+        self.assertEqual (['limbo', 'purgatory', 'trap'], sorted (s.name for s in report.dead_ends))
+
+    def test_reachable_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'to do',     'to' : 'done' },
+            { 'from' : 'limbo',     'to' : 'purgatory' },
+            { 'from' : 'purgatory', 'to' : 'limbo' },
+        ])
+
+        self.assertEqual (['done', 'to do'], sorted (s.name for s in fsm.reachable()))
+        self.assertEqual (['limbo', 'purgatory'], sorted (s.name for s in fsm.unreachable()))
+        self.assertEqual (['limbo', 'purgatory'], sorted (s.name for s in fsm.reachable ('limbo')))
+        self.assertEqual (['done', 'to do'], sorted (s.name for s in fsm.unreachable ('limbo')))
+
+        with self.assertRaises (LookupError):
+            fsm.reachable ('nowhere')
+
+    def test_issues_03 (self):
+        issues = Issues (issues = [{ 'title' : 'a', 'state' : 'to do' }])
+        issues.merge (Issues (issues = [
+            { 'title' : 'b', 'state' : 'to do' },
+            { 'title' : 'c', 'state' : 'done' },
+        ]))
+
+        self.assertEqual (3, len (issues))
+        self.assertEqual (['a', 'b'], [i.title for i in issues.in_state ('to do')])
+        self.assertEqual (1, issues.count ('done'))
+
+    def test_issues_04 (self):
+        issues = pickle.loads (pickle.dumps (Issues (issues = [
+            { 'title' : 'a', 'state' : 'to do' },
+            { 'title' : 'b', 'state' : 'done' },
+            { 'title' : 'c', 'state' : 'to do' },
+        ])))
+
+        self.assertEqual (3, len (issues))
+        self.assertEqual (['a', 'c'], [i.title for i in issues.in_state ('to do')])
+        self.assertEqual ('done', issues.in_state ('done')[0].state)
+
+    def test_patch_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'to do',   'to' : 'doing' },
+            { 'from' : 'to do',   'to' : 'on hold' },
+            { 'from' : 'doing',   'to' : 'done' },
+            { 'from' : 'on hold', 'to' : 'doing' },
+        ])
+        doing = fsm.fetch_state ('doing')
+
+        fsm.patch (
+            remove = [
+                { 'from' : 'to do',   'to' : 'on hold' },
+                { 'from' : 'on hold', 'to' : 'doing' },
+            ],
+            add = [
+                { 'from' : 'done', 'to' : 'archived' },
+            ],
+        )
+
+        # 'on hold' is left without transitions and dropped, other states are kept
+        self.assertFalse (fsm.known_state ('on hold'))
+        self.assertIs (doing, fsm.fetch_state ('doing'))
+        self.assertEqual (
+            ['to do', 'doing', 'done', 'archived'],
+            [s.name for s in fsm.workflow()],
+        )
+        self.assertEqual ([False, False, False, True], [s.is_end for s in fsm.workflow()])
+
+    def test_patch_02 (self):
+        # invalid changes are rolled back
+        transitions = [
+            { 'from' : 'to do', 'to' : 'doing' },
+            { 'from' : 'doing', 'to' : 'done' },
+        ]
+        fsm = FSM (transitions = transitions)
+
+        with self.assertRaises (RuntimeWarning):
+            fsm.patch (
+                remove = [{ 'from' : 'to do', 'to' : 'doing' }],
+                add = [{ 'from' : 'new', 'to' : 'done' }],
+            )
+
+        with self.assertRaises (LookupError):
+            fsm.patch (remove = [{ 'from' : 'done', 'to' : 'to do' }])
+
+        self.assertEqual (['to do', 'doing', 'done'], [s.name for s in fsm.workflow()])
+        self.assertEqual (3, len (fsm.states))
+
+    def test_patch_03 (self):
+        # incrementally kept degrees match a full recount
+        fsm = FSM (transitions = [
+            { 'from' : 'to do', 'to' : 'doing' },
+            { 'from' : 'doing', 'to' : 'done' },
+        ])
+        fsm.add_transition ('doing', 'review')
+        fsm.add_transition ('review', 'done')
+        fsm.remove_transition ('doing', 'done')
+
+        flags = [(s.name, s.is_start, s.is_end) for s in fsm.states]
+        self.assertEqual (None, fsm.validate().error)
+
+        fsm.invalidate ()
+        fsm.validate ()
+        self.assertEqual (flags, [(s.name, s.is_start, s.is_end) for s in fsm.states])
+        self.assertEqual ('to do', fsm.fetch_start_state().name)
+
+        with self.assertRaises (LookupError):
+            fsm.remove_state ('review')
+
+    def test_patch_04 (self):
+        # patches not changing the depth-first workflow don't recompute it
+        self.addCleanup (stats.reset)
+        self.addCleanup (stats.disable)
+        stats.enable ()
+
+        fsm = FSM (transitions = [
+            { 'from' : 'to do',   'to' : 'doing' },
+            { 'from' : 'to do',   'to' : 'on hold' },
+            { 'from' : 'doing',   'to' : 'done' },
+            { 'from' : 'doing',   'to' : 'failed' },
+            { 'from' : 'on hold', 'to' : 'doing' },
+        ])
+        workflow = [s.name for s in fsm.workflow()]
+        self.assertEqual (['to do', 'doing', 'done', 'failed', 'on hold'], workflow)
+
+        def computed ():
+            return stats.phases()['fsm workflow'][0]
+
+        # to states found before their source, and from states not
+        # reached at all (rolled back, two start states)
+        fsm.patch (add = [{ 'from' : 'on hold', 'to' : 'done' }, { 'from' : 'failed', 'to' : 'doing' }])
+        fsm.patch (remove = [{ 'from' : 'failed', 'to' : 'doing' }])
+        with self.assertRaises (RuntimeWarning):
+            fsm.patch (add = [{ 'from' : 'new', 'to' : 'doing' }])
+
+        self.assertEqual (workflow, [s.name for s in fsm.workflow()])
+        self.assertEqual (1, computed())
+
+        # a new state or a transition found earlier than before does
+        fsm.patch (add = [{ 'from' : 'done', 'to' : 'archived' }])
+        self.assertEqual (['to do', 'doing', 'done', 'archived', 'failed', 'on hold'], [s.name for s in fsm.workflow()])
+        self.assertEqual (2, computed())
+
+        fsm.patch (add = [{ 'from' : 'doing', 'to' : 'archived' }])
+        fsm.workflow ()
+        self.assertEqual (3, computed())
+
+    def test_patch_05 (self):
+        # kept workflows are the ones computed from scratch
+        rng = random.Random (4711)
+        names = ['S{}'.format (i) for i in range (12)]
+        transitions = [{ 'from' : 'start', 'to' : name } for name in names] + [
+            { 'from' : name, 'to' : 'end' } for name in names
+        ]
+        fsm = FSM (transitions = transitions)
+
+        for n in range (300):
+            edge = { 'from' : rng.choice (names), 'to' : rng.choice (names) }
+            if rng.random() < 0.1:
+                # a new state leading to the start state becomes the start state
+                edge = { 'from' : 'N{}'.format (n), 'to' : fsm.fetch_start_state().name }
+
+            if edge in transitions and rng.random() < 0.5:
+                transitions.remove (edge)
+                change = dict (remove = [edge])
+            else:
+                transitions.append (edge)
+                change = dict (add = [edge])
+
+            try:
+                fsm.patch (**change)
+            except RuntimeWarning:
+                (transitions.append if 'remove' in change else transitions.remove) (edge)
+                continue
+
+            if edge['from'] not in names and fsm.known_state (edge['from']):
+                names.append (edge['from'])
+
+            self.assertEqual (
+                [s.name for s in FSM (transitions = transitions).workflow()],
+                [s.name for s in fsm.workflow()],
+            )
+
+    def test_issues_05 (self):
+        issues = Issues (issues = [
+            { 'title' : 'a', 'state' : 'to do' },
+            { 'title' : 'b', 'state' : 'to do' },
+            { 'title' : 'c', 'state' : 'to do' },
+            { 'title' : 'b', 'state' : 'to do' },
+        ])
+
+        issue = issues.move ('b', 'to do', 'doing')
+        self.assertEqual ('doing', issue.state)
+        self.assertEqual ({ 'to do' : 3, 'doing' : 1 }, issues.counts())
+        self.assertEqual (4, len (issues))
+
+        # the remaining 'b' can be moved too, then there's none left
+        issues.move ('b', 'to do', 'doing')
+        with self.assertRaises (LookupError):
+            issues.move ('b', 'to do', 'doing')
+
+        issues.add (Issue (title = 'd', state = 'to do'))
+        issues.move ('d', 'to do', 'done')
+        self.assertEqual (['a', 'c'], [i.title for i in issues.in_state ('to do')])
+        self.assertEqual (['b', 'b'], [i.title for i in issues.in_state ('doing')])
+
+        issues.move ('a', 'to do', 'done')
+        issues.move ('c', 'to do', 'done')
+        self.assertEqual ({ 'doing', 'done' }, issues.states())
+        self.assertEqual (['b', 'b', 'd', 'a', 'c'], [i.title for i in issues])
+
+    def test_transitions_01 (self):
+        fsm = FSM (transitions = [
+            { 'from' : 'to do', 'to' : 'doing' },
+            { 'from' : 'doing', 'to' : 'done' },
+        ])
+        self.assertTrue (fsm.has_transition ('to do', 'doing'))
+        self.assertFalse (fsm.has_transition ('doing', 'to do'))
+
+        fsm.add_transition ('doing', 'to do')
+        fsm.add_transition ('doing', 'to do')
+        fsm.remove_transition ('doing', 'to do')
+        self.assertTrue (fsm.has_transition ('doing', 'to do'))
+
+        fsm.fetch_state ('doing').events.clear()
+        fsm.invalidate ()
+        self.assertFalse (fsm.has_transition ('doing', 'done'))
@@ -0,0 +1,79 @@
+import unittest
+import unittest.mock
+import shutil
+import io
+import os
+
+from coffee.coffee import FSM
+from coffee.graph import graph, layers, write_dot, write_ascii
+
+TRANSITIONS = [
+    { 'from' : 'to do',   'to' : 'doing' },
+    { 'from' : 'to do',   'to' : 'on hold' },
+    { 'from' : 'doing',   'to' : 'done' },
+    { 'from' : 'doing',   'to' : 'on hold' },
+    { 'from' : 'on hold', 'to' : 'doing' },
+]
+
+class Test_Graph (unittest.TestCase):
+
+    def test_dot (self):
+        out = io.StringIO()
+        write_dot (FSM (transitions = TRANSITIONS + [{ 'from' : 'done', 'to' : 'say "hi"' }]), out, ['fsm.yml'])
+
+        dot = out.getvalue()
+        self.assertTrue (dot.startswith ('// FSM from: fsm.yml\ndigraph FSM {\n'))
+        self.assertIn ('\t"to do" [label="to do" shape=doublecircle]\n', dot)
+        self.assertIn ('\t"done" -> "say \\"hi\\""\n', dot)
+        self.assertEqual (6, dot.count (' -> '))
+
+    def test_layers (self):
+        fsm = FSM (transitions = TRANSITIONS + [{ 'from' : 'lost', 'to' : 'done' }, { 'from' : 'to do', 'to' : 'lost' }])
+        fsm.remove_transition ('to do', 'lost')
+        fsm.add_transition ('lost', 'lost')
+
+        layered, unreachable = layers (fsm)
+        self.assertEqual (
+            [['to do'], ['doing', 'on hold'], ['done']],
+            [[s.name for s in layer] for layer in layered],
+        )
+        self.assertEqual (['lost'], [s.name for s in unreachable])
+
+    def test_ascii (self):
+        out = io.StringIO()
+        graph (fsm = FSM (transitions = TRANSITIONS), fmt = 'ascii', out = out)
+
+        self.assertIn (
+            '  +-------+  +---------+\n'
+            '  | doing |  | on hold |\n'
+            '  +-------+  +---------+\n'
+            '    doing -> done, ^on hold\n'
+            '    on hold -> ^doing\n',
+            out.getvalue(),
+        )
+
+    def test_ascii_wrapped (self):
+        out = io.StringIO()
+        write_ascii (FSM (transitions = [
+            { 'from' : 'start', 'to' : 'state {}'.format (i) } for i in range (20)
+        ]), out, width = 40)
+
+        drawing = out.getvalue().split ('(S) ...')[0]
+        self.assertTrue (all (len (line) <= 40 for line in drawing.splitlines()))
+        self.assertEqual (20, out.getvalue().count ('| state '))
+
+    def test_svg (self):
+        with unittest.mock.patch ('subprocess.run') as run:
+            first = graph (fsm = FSM (transitions = TRANSITIONS), fmt = 'svg')
+            second = graph (fsm = FSM (transitions = TRANSITIONS), fmt = 'svg')
+
+        # every drawing gets a directory of its own
+        self.addCleanup (shutil.rmtree, os.path.dirname (first))
+        self.addCleanup (shutil.rmtree, os.path.dirname (second))
+
+        self.assertNotEqual (os.path.dirname (first), os.path.dirname (second))
+        self.assertTrue (os.path.isfile (os.path.join (os.path.dirname (first), 'FSM.gv')))
+        self.assertEqual (['dot', '-Tsvg', '-o', first], run.call_args_list[0][0][0][:4])
+
+        with self.assertRaises (RuntimeWarning):
+            graph (fsm = FSM (transitions = TRANSITIONS), fmt = 'png')
@@ -0,0 +1,81 @@
+import unittest
+import io
+import os
+import yaml
+
+from coffee.ingest import iter_jsonl, iter_yaml
+
+COMBINED = os.path.join (os.path.dirname (__file__), '..', '..', 'combined.yml')
+
+class Test_Ingest (unittest.TestCase):
+
+    def test_yaml_01 (self):
+        records = list (iter_yaml (io.StringIO ('''
+transitions:
+    - from: to do
+      to: doing
+issues:
+    - title: Make coffee
+      state: doing
+    - { title: Drink coffee, state: done }
+''')))
+
+        self.assertEqual (
+            records,
+            [ ('transitions', { 'from' : 'to do', 'to' : 'doing' }),
+              ('issues', { 'title' : 'Make coffee', 'state' : 'doing' }),
+              ('issues', { 'title' : 'Drink coffee', 'state' : 'done' }),
+            ],
+        )
+
+    def test_yaml_02 (self):
+        # unknown and nested values are skipped
+        records = list (iter_yaml (io.StringIO ('''
+version: 1
+meta: { nested: [1, 2, { a: b }] }
+issues:
+    - just a string
+    - title: Make coffee
+      state: doing
+      tags: [hot, black]
+''')))
+
+        self.assertEqual (
+            records,
+            [('issues', { 'title' : 'Make coffee', 'state' : 'doing' })],
+        )
+
+    def test_yaml_03 (self):
+        # the top-level node must be a mapping
+        for data in ('', 'just a string', '[1, 2]'):
+            with self.assertRaises (RuntimeWarning):
+                list (iter_yaml (io.StringIO (data)))
+
+    def test_jsonl_01 (self):
+        records = list (iter_jsonl (io.StringIO (
+            '{"title": "Make coffee", "state": "doing"}\n'
+            '\n'
+            '{"title": "Drink coffee", "state": "done"}\n'
+        )))
+
+        self.assertEqual (
+            records,
+            [ { 'title' : 'Make coffee', 'state' : 'doing' },
+              { 'title' : 'Drink coffee', 'state' : 'done' },
+            ],
+        )
+
+    def test_jsonl_02 (self):
+        for data in ('{"title": ', '[1, 2]'):
+            with self.assertRaises (RuntimeWarning):
+                list (iter_jsonl (io.StringIO (data)))
+
+    def test_yaml_04 (self):
+        # the pure-python loader is a drop-in fallback for libyaml
+        with open (COMBINED) as infile:
+            fast = list (iter_yaml (infile))
+        with open (COMBINED) as infile:
+            slow = list (iter_yaml (infile, loader = yaml.SafeLoader))
+
+        self.assertEqual (13, len (fast))
+        self.assertEqual (fast, slow)
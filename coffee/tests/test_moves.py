@@ -0,0 +1,54 @@
+import unittest
+import io
+
+from coffee.coffee import Issues, FSM
+from coffee.moves import Move, Moves
+
+class Test_Moves (unittest.TestCase):
+
+    def setUp (self):
+        self.fsm = FSM (transitions = [
+            { 'from' : 'to do',   'to' : 'doing' },
+            { 'from' : 'doing',   'to' : 'on hold' },
+            { 'from' : 'on hold', 'to' : 'doing' },
+            { 'from' : 'doing',   'to' : 'done' },
+        ])
+        self.issues = Issues (issues = [
+            { 'title' : 'Make coffee',  'state' : 'to do' },
+            { 'title' : 'Drink coffee', 'state' : 'to do' },
+        ])
+
+    def test_append (self):
+        moves = Moves (fsm = self.fsm, issues = self.issues)
+        moves.append (Move (title = 'Make coffee', frm = 'to do', to = 'doing'))
+
+        with self.assertRaises (RuntimeWarning):
+            moves.append (Move (title = 'Drink coffee', frm = 'to do', to = 'done'))
+        with self.assertRaises (LookupError):
+            moves.append (Move (title = 'Drink coffee', frm = 'doing', to = 'done'))
+
+        self.assertEqual (1, len (moves))
+        self.assertEqual ({ 'to do' : 1, 'doing' : 1 }, self.issues.counts())
+
+    def test_ingest (self):
+        moves = Moves (fsm = self.fsm, issues = self.issues)
+
+        count = moves.ingest (io.StringIO (
+            '{"title": "Make coffee", "from": "to do", "to": "doing"}\n'
+            '{"title": "Make coffee", "from": "doing", "to": "on hold"}\n'
+            '\n'
+            '{"title": "Make coffee", "from": "on hold", "to": "doing"}\n'
+        ))
+        self.assertEqual (3, count)
+        self.assertEqual (['Make coffee'], [i.title for i in self.issues.in_state ('doing')])
+
+        # moves before an invalid one remain applied
+        with self.assertRaisesRegex (RuntimeWarning, '^move 2: '):
+            moves.ingest (io.StringIO (
+                '{"title": "Make coffee", "from": "doing", "to": "done"}\n'
+                '{"title": "Make coffee", "from": "doing", "to": "done"}\n'
+            ))
+
+        self.assertEqual (4, len (moves))
+        self.assertEqual ('done', list (moves)[-1].to)
+        self.assertEqual (['Make coffee'], [i.title for i in self.issues.in_state ('done')])
@@ -0,0 +1,94 @@
+import unittest
+import re
+import shlex
+
+from coffee.coffee import Issue, Issues, FSM
+from coffee import query
+
+TRANSITIONS = [
+    { 'from' : 'to do',   'to' : 'doing' },
+    { 'from' : 'doing',   'to' : 'on hold' },
+    { 'from' : 'on hold', 'to' : 'doing' },
+    { 'from' : 'doing',   'to' : 'done' },
+]
+
+ISSUES = [
+    { 'title' : 'Make coffee',        'state' : 'to do' },
+    { 'title' : 'Make more coffee',   'state' : 'doing' },
+    { 'title' : 'Drink coffee',       'state' : 'on hold' },
+    { 'title' : 'Buy beans',          'state' : 'done' },
+    { 'title' : 'Wash cups',          'state' : 'done' },
+]
+
+class Test_Query (unittest.TestCase):
+
+    def setUp (self):
+        self.fsm = FSM (transitions = TRANSITIONS)
+        self.issues = Issues (issues = ISSUES)
+
+    def run_query (self, text):
+        result = query.compile (text, self.fsm).run (self.issues)
+        return {name: sorted (i.title for i in issues) for name, issues in result.items()}
+
+    def test_literals (self):
+        self.assertEqual (['coffee'], query.required_literals ('coffee'))
+        self.assertEqual (['make ', ' coffee'], query.required_literals ('^Make .* COFFEE$'))
+        self.assertEqual (['cof'], query.required_literals ('coff?ee'))
+        self.assertEqual (['ab.c'], query.required_literals (r'ab\.c\d'))
+        self.assertEqual (['fee'], query.required_literals ('(cof)?fee[xyz]'))
+        self.assertEqual ([], query.required_literals ('coffee|tea'))
+        self.assertEqual ([], query.required_literals ('ab+'))
+        self.assertEqual ([], query.required_literals ('cof{1,2}ee'))
+        self.assertEqual (['mak', ' coffee'], query.required_literals ('make{2} coffee'))
+        self.assertEqual ([], query.required_literals ('(?i)coffee'))
+        self.assertEqual ([], query.required_literals ('(?x) make \\ coffee'))
+
+    def test_literals_search (self):
+        # queries find what re.search finds, quantifiers and inline flags
+        # must not make the title index drop matching issues
+        for pattern in ('cof{1,2}ee', 'cof{2}ee', 'Ma{1}ke more', 'Make{0,1} coffee', '(?i)DRINK', '(?x) Make \\ more'):
+            expected = {}
+            for issue in ISSUES:
+                if re.search (pattern, issue['title']):
+                    expected.setdefault (issue['state'], []).append (issue['title'])
+
+            self.assertTrue (expected, pattern)
+            self.assertEqual (expected, self.run_query ('title {}'.format (shlex.quote (pattern))), pattern)
+
+    def test_states (self):
+        self.assertEqual (
+            { 'doing' : ['Make more coffee'], 'on hold' : ['Drink coffee'], 'done' : ['Buy beans', 'Wash cups'] },
+            self.run_query ('reachable "on hold"'),
+        )
+        self.assertEqual ({ 'done' : ['Buy beans', 'Wash cups'] }, self.run_query ('reachable doing state done'))
+
+        with self.assertRaises (LookupError):
+            self.run_query ('reachable nowhere')
+
+    def test_title (self):
+        self.assertEqual (
+            { 'to do' : ['Make coffee'], 'doing' : ['Make more coffee'] },
+            self.run_query ('title "^Make .*coffee"'),
+        )
+        self.assertEqual ({ 'on hold' : ['Drink coffee'] }, self.run_query ('reachable "on hold" title "(?i)Co?ffee$" state "on hold"'))
+        self.assertEqual ({}, self.run_query ('title tea'))
+        self.assertEqual ({ 'done' : 2 }, query.compile ('title s count').run (self.issues))
+
+        for text in ('title', 'title (', 'colour blue', 'title "unbalanced'):
+            with self.assertRaises (RuntimeWarning):
+                query.compile (text)
+
+    def test_index (self):
+        index = query.title_index (self.issues)
+        self.assertIs (index, query.title_index (self.issues))
+        self.assertEqual (['Drink coffee', 'Make coffee', 'Make more coffee'], sorted (i.title for i in index.candidates (['coffee'])))
+        self.assertIsNone (index.candidates (['coffee'], limit = 2))
+
+        # moves keep the index, new issues outdate it
+        self.issues.move ('Make coffee', 'to do', 'doing')
+        self.assertIs (index, query.title_index (self.issues))
+        self.assertEqual ({ 'doing' : ['Make coffee', 'Make more coffee'] }, self.run_query ('title Make state doing'))
+
+        self.issues.add (Issue (title = 'Make tea', state = 'to do'))
+        self.assertEqual ({ 'to do' : ['Make tea'] }, self.run_query ('title "make tea|Make tea"'))
+        self.assertIsNot (index, query.title_index (self.issues))
@@ -0,0 +1,90 @@
+import unittest
+import csv
+import io
+
+from coffee.coffee import FSM, Issues
+from coffee.ingest import iter_jsonl
+from coffee import report
+
+TRANSITIONS = [
+    { 'from' : 'to do',   'to' : 'doing' },
+    { 'from' : 'doing',   'to' : 'done' },
+    { 'from' : 'doing',   'to' : 'on hold' },
+    { 'from' : 'on hold', 'to' : 'doing' },
+]
+
+ISSUES = [
+    { 'title' : 'Make coffee',            'state' : 'doing' },
+    { 'title' : 'Fill water tank',        'state' : 'to do' },
+    { 'title' : 'Beans, "fresh" ones',    'state' : 'to do' },
+    { 'title' : 'Descale *the* machine',  'state' : 'on hold' },
+    { 'title' : 'Lost',                   'state' : 'nowhere' },
+]
+
+class Test_Report (unittest.TestCase):
+
+    def setUp (self):
+        self.fsm = FSM (transitions = TRANSITIONS)
+        self.issues = Issues (issues = ISSUES)
+
+    def export (self, fmt, **kwa):
+        out = io.StringIO (newline = '')
+        report.write (self.fsm, self.issues, out, fmt, **kwa)
+        return out.getvalue()
+
+    def test_writer (self):
+        written = []
+
+        class Out ():
+            def write (self, text):
+                written.append (text)
+
+        with report.Writer (Out(), size = 10) as writer:
+            writer.write ('abcd')
+            writer.write ('efgh')
+            self.assertEqual ([], written)
+            writer.write ('ijkl')
+            self.assertEqual (['abcdefghijkl'], written)
+            writer.write ('mn')
+
+        self.assertEqual (['abcdefghijkl', 'mn'], written)
+
+    def test_text (self):
+        text = self.export ('text')
+        self.assertIn ('  (*) to do  (S)\n    (-) Fill water tank\n    (-) Beans, "fresh" ones\n', text)
+        self.assertNotIn ('Lost', text)
+
+        text = self.export ('text', limit = 1, page = 2)
+        self.assertIn ('  (*) to do  (S)\n    (-) Beans, "fresh" ones\n  (*) doing \n', text)
+
+    def test_csv (self):
+        rows = list (csv.reader (io.StringIO (self.export ('csv'), newline = '')))
+
+        self.assertEqual ([
+            ['state', 'title'],
+            ['to do', 'Fill water tank'],
+            ['to do', 'Beans, "fresh" ones'],
+            ['doing', 'Make coffee'],
+            ['on hold', 'Descale *the* machine'],
+        ], rows)
+
+        # no quoting needed, the fast path
+        self.issues = Issues (issues = [{ 'title' : 'A', 'state' : 'on hold' }, { 'title' : 'B', 'state' : 'on hold' }])
+        self.assertEqual ('state,title\non hold,A\non hold,B\n', self.export ('csv'))
+
+    def test_jsonl (self):
+        # exports load again
+        records = list (iter_jsonl (io.StringIO (self.export ('jsonl'))))
+
+        self.assertEqual ([ISSUES[1], ISSUES[2], ISSUES[0], ISSUES[3]], records)
+
+    def test_markdown (self):
+        text = self.export ('markdown')
+
+        self.assertTrue (text.startswith ('# Issues\n\n## to do, start (2)\n\n- Fill water tank\n'))
+        self.assertIn ('## done, end (0)\n', text)
+        self.assertIn ('- Descale \\*the\\* machine\n', text)
+
+    def test_invalid (self):
+        with self.assertRaises (RuntimeWarning):
+            self.export ('xml')
@@ -0,0 +1,102 @@
+import unittest
+import unittest.mock
+import asyncio
+import tempfile
+import shutil
+import json
+import os
+
+from coffee.server import Server
+
+DATA = os.path.join (os.path.dirname (__file__), '..', '..')
+
+class Test_Server (unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp (self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup (directory.cleanup)
+        self.directory = directory.name
+
+        env = unittest.mock.patch.dict (os.environ, { 'COFFEE_CACHE' : os.path.join (self.directory, 'cache') })
+        env.start()
+        self.addCleanup (env.stop)
+
+        for filename in ('fsm.yml', 'issues1.yml'):
+            shutil.copy (os.path.join (DATA, filename), self.directory)
+
+        self.server = Server (patterns = os.path.join (self.directory, '*.yml'))
+        self.listening = await self.server.start()
+        self.port = self.listening.sockets[0].getsockname()[1]
+
+    async def asyncTearDown (self):
+        self.listening.close()
+        await self.listening.wait_closed()
+
+    async def get (self, *paths):
+        # OUT: list of (status, decoded JSON), all requests on one connection
+        reader, writer = await asyncio.open_connection ('127.0.0.1', self.port)
+        responses = []
+        try:
+            for path in paths:
+                writer.write ('GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n'.format (path).encode())
+                status = int ((await reader.readline()).split()[1])
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode()
+                    if line == '\r\n':
+                        break
+                    name, _, value = line.partition (':')
+                    headers[name.lower()] = value.strip()
+                body = await reader.readexactly (int (headers['content-length']))
+                responses.append ((status, json.loads (body)))
+        finally:
+            writer.close()
+
+        return responses
+
+    async def test_endpoints (self):
+        status, workflow, issues, counts, reachable = await self.get (
+            '/', '/workflow', '/issues?limit=1&state=failed', '/counts', '/reachable?from=on%20hold',
+        )
+
+        self.assertEqual ((200, 7), (status[0], status[1]['issues']))
+        self.assertEqual (['to do', 'doing', 'done', 'failed', 'on hold'], [s['name'] for s in workflow[1]])
+        self.assertTrue (workflow[1][0]['is_start'])
+        self.assertEqual (
+            [{ 'state' : 'failed', 'count' : 2, 'issues' : ['Turn old coffee machine off and on again'] }],
+            issues[1],
+        )
+        self.assertEqual (2, counts[1]['to do'])
+        self.assertEqual (['doing', 'done', 'failed', 'on hold'], sorted (reachable[1]))
+
+        query, = await self.get ('/query?q=title+%27coff%3Fee+machine%24%27')
+        self.assertEqual ({ 'done' : ['Get new coffee machine'], 'failed' : ['Repair old coffee machine'] }, query[1])
+
+    async def test_errors (self):
+        responses = await self.get ('/nowhere', '/reachable?from=nowhere', '/issues?limit=x', '/query?q=title+%5B')
+        self.assertEqual ([404, 400, 400, 400], [status for status, body in responses])
+        self.assertTrue (all ('error' in body for status, body in responses))
+
+    async def test_concurrent (self):
+        results = await asyncio.gather (*[self.get ('/counts', '/workflow') for _ in range (20)])
+        self.assertEqual ({ 200 }, { status for responses in results for status, body in responses })
+
+    async def test_reload (self):
+        self.assertFalse (await self.server.reload())
+
+        with open (os.path.join (self.directory, 'issues2.yml'), 'w') as f:
+            f.write ('issues:\n    - { title: Clean up, state: done }\n')
+
+        self.assertTrue (await self.server.reload())
+        status, = await self.get ('/')
+        self.assertEqual ((2, 8), (status[1]['version'], status[1]['issues']))
+
+        # broken files are reported, the loaded model is kept
+        with open (os.path.join (self.directory, 'issues2.yml'), 'w') as f:
+            f.write ('transitions:\n    - { from: done, to: to do }\n')
+
+        with self.assertRaises (RuntimeWarning):
+            await self.server.reload()
+
+        status, = await self.get ('/')
+        self.assertEqual ((2, 8), (status[1]['version'], status[1]['issues']))
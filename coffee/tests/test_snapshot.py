@@ -0,0 +1,90 @@
+import unittest
+import unittest.mock
+import tempfile
+import os
+
+from array import array
+
+from coffee import snapshot
+from coffee.coffee import Issue, Issues
+
+class Test_Snapshot (unittest.TestCase):
+
+    def setUp (self):
+        cache = tempfile.TemporaryDirectory()
+        self.addCleanup (cache.cleanup)
+
+        env = unittest.mock.patch.dict (os.environ, { 'COFFEE_CACHE' : cache.name })
+        env.start()
+        self.addCleanup (env.stop)
+
+        self.input = os.path.join (cache.name, 'input.yml')
+        with open (self.input, 'w') as f:
+            f.write ('whatever, only the content hash matters')
+
+    def test_snapshot_01 (self):
+        issues = Issues()
+        issues.add (Issue (title = 'Make coffee', state = 'doing'))
+        issues.add (Issue (title = 'Drink coffee ☕', state = 'done'))
+        issues.add (Issue (title = None, state = 'doing'))
+
+        self.assertIsNone (snapshot.load (self.input))
+        self.assertTrue (snapshot.save (self.input, {
+            'transitions'     : [{ 'from' : 'doing', 'to' : 'done' }],
+            'add_transitions' : [{ 'from' : 'done', 'to' : 'archived' }],
+        }, issues))
+
+        transitions, loaded = snapshot.load (self.input)
+
+        self.assertEqual ({
+            'transitions'     : [{ 'from' : 'doing', 'to' : 'done' }],
+            'add_transitions' : [{ 'from' : 'done', 'to' : 'archived' }],
+        }, transitions)
+        self.assertEqual ({ 'doing' : 2, 'done' : 1 }, loaded.counts())
+        self.assertEqual (['Make coffee', None], [i.title for i in loaded.in_state ('doing')])
+        self.assertEqual (['Drink coffee ☕'], [i.title for i in loaded.in_state ('done')])
+
+    def test_snapshot_02 (self):
+        # changed content, changed key
+        path = snapshot.save (self.input, {}, Issues())
+
+        with open (self.input, 'a') as f:
+            f.write ('!')
+
+        self.assertNotEqual (path, snapshot.snapshot_path (self.input))
+        self.assertIsNone (snapshot.load (self.input))
+
+    def test_snapshot_03 (self):
+        # broken snapshots are a cache miss
+        path = snapshot.save (self.input, { 'transitions' : [{ 'from' : 'a', 'to' : 'b' }] }, Issues())
+
+        with open (path, 'r+b') as f:
+            f.truncate (os.path.getsize (path) - 1)
+        self.assertIsNone (snapshot.load (self.input))
+
+        with open (path, 'wb') as f:
+            f.write (b'garbage')
+        self.assertIsNone (snapshot.load (self.input))
+
+    def test_snapshot_05 (self):
+        # string ids out of range are a cache miss, too
+        issues = Issues()
+        issues.add (Issue (title = 'Make coffee', state = 'doing'))
+        path = snapshot.save (self.input, { 'transitions' : [{ 'from' : 'a', 'to' : 'b' }] }, issues)
+        self.assertIsNotNone (snapshot.load (self.input))
+
+        with open (path, 'rb') as f:
+            n_strings = snapshot.COUNTS.unpack_from (f.read(), len (snapshot.MAGIC))[0]
+
+        # magic, counts, string offsets, 1 transition, then the issue's title id
+        title = len (snapshot.MAGIC) + snapshot.COUNTS.size + (n_strings + 1) * 8 + 3 * 4
+        for corrupted in (array ('I', [0x7ffffffe]), array ('I', [n_strings])):
+            with open (path, 'r+b') as f:
+                f.seek (title)
+                f.write (corrupted.tobytes())
+            self.assertIsNone (snapshot.load (self.input))
+
+    def test_snapshot_04 (self):
+        with unittest.mock.patch.dict (os.environ, { 'COFFEE_CACHE' : '' }):
+            self.assertIsNone (snapshot.save (self.input, {}, Issues()))
+            self.assertIsNone (snapshot.load (self.input))
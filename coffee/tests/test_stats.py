@@ -0,0 +1,45 @@
+import unittest
+
+from coffee import stats
+
+class Test_Stats (unittest.TestCase):
+
+    def setUp (self):
+        self.addCleanup (stats.reset)
+        self.addCleanup (stats.disable)
+
+    def test_off (self):
+        stats.disable ()
+        with stats.phase ('parse'):
+            stats.count ('issues', 3)
+
+        self.assertEqual ({}, stats.phases())
+        self.assertEqual ({}, stats.counters())
+
+    def test_phases (self):
+        stats.enable ()
+        for _ in range (2):
+            with stats.phase ('load'):
+                with stats.phase ('parse'):
+                    stats.count ('issues', 3)
+
+        self.assertEqual (['load', 'parse'], sorted (stats.phases()))
+        calls, seconds, peak = stats.phases()['parse']
+        self.assertEqual ((2, None), (calls, peak))
+        self.assertLessEqual (seconds, stats.phases()['load'][1])
+        self.assertEqual ({ 'issues' : 6 }, stats.counters())
+
+    def test_memory (self):
+        stats.enable (memory = True)
+        with stats.phase ('load'):
+            with stats.phase ('parse'):
+                data = [str (i) for i in range (10000)]
+            del data
+            with stats.phase ('build'):
+                pass
+
+        # the enclosing phase's peak includes its inner phases' peaks
+        self.assertGreater (stats.phases()['parse'][2], 10000 * 40)
+        self.assertGreaterEqual (stats.phases()['load'][2], stats.phases()['parse'][2])
+        self.assertLess (stats.phases()['build'][2], 10000)
+        self.assertIn ('MiB', '\n'.join (stats.report()))